@@ -1,9 +1,16 @@
+from __future__ import annotations
+
 import argparse
+import os
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 from sklearn.datasets import fetch_openml
+from sklearn.model_selection import train_test_split
 
 
 def _resolve_input_path(raw_data: str) -> Path:
@@ -19,71 +26,132 @@ def _resolve_input_path(raw_data: str) -> Path:
     raise FileNotFoundError(f"raw_data path not found: {raw_data}")
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser()
+def _openml_cache_dir() -> Path:
+    return Path(os.getenv("XDG_CACHE_HOME", Path.home() / ".cache")) / "mlops-workshop"
+
+
+def _cached_openml(data_id: int) -> pd.DataFrame:
+    """Fetch an OpenML dataset as a DataFrame, caching the parsed frame as Parquet."""
+    cache_dir = _openml_cache_dir()
+    cache_path = cache_dir / f"openml-{data_id}.parquet"
+    if cache_path.exists():
+        return pq.read_table(cache_path).to_pandas()
+
+    # Use try/except for sklearn version compatibility
+    # parser="auto" was added in sklearn 1.2+
+    data_home = str(cache_dir / "openml")
+    try:
+        bunch = fetch_openml(data_id=data_id, as_frame=True, parser="auto", data_home=data_home)
+    except TypeError:
+        # Fallback for sklearn < 1.2
+        bunch = fetch_openml(data_id=data_id, as_frame=True, data_home=data_home)
+    df = bunch.frame
+
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(".parquet.tmp")
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+        tmp_path.replace(cache_path)
+    except OSError as e:
+        print(f"[WARN] Could not cache OpenML dataset {data_id}: {e}")
+    return df
+
+
+def write_split(df: pd.DataFrame, out_dir: Path, name: str, fmt: str) -> Path:
+    if fmt == "csv":
+        path = out_dir / f"{name}.csv"
+        df.to_csv(path, index=False)
+    else:
+        path = out_dir / f"{name}.parquet"
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, compression="snappy")
+    return path
+
+
+def prepare(
+    raw_data: str | None, test_size: float, random_state: int, noise_std: float
+) -> tuple[pd.DataFrame, pd.DataFrame, str]:
+    """Load, optionally perturb and split the dataset; returns (train_df, test_df, input_name)."""
+    input_name = "openml:spambase"
+    if raw_data:
+        input_file = _resolve_input_path(raw_data)
+        # Multithreaded Arrow parser; numpy-backed dtypes so the noise/split code is unchanged
+        table = pacsv.read_csv(input_file, read_options=pacsv.ReadOptions(use_threads=True))
+        df = table.to_pandas()
+        input_name = input_file.name
+    else:
+        df = _cached_openml(data_id=44).rename(columns={"class": "label"})
+
+    if "label" not in df.columns:
+        raise ValueError("Expected a 'label' column in input CSV")
+
+    # Ensure numeric label
+    df["label"] = df["label"].astype(np.int8)
+
+    # Optional noise to mimic drift
+    if noise_std and noise_std > 0:
+        feature_cols = [c for c in df.columns if c != "label"]
+        rng = np.random.default_rng(random_state)
+        # One float32 copy of the feature block; the noise is added in place.
+        arr = df[feature_cols].to_numpy(dtype=np.float32, copy=True)
+        noise = rng.standard_normal(arr.shape, dtype=np.float32)
+        noise *= np.float32(noise_std)
+        np.add(arr, noise, out=arr)
+        df[feature_cols] = arr
+
+    # Shuffle + split, stratified on label so both splits keep the class balance
+    train_df, test_df = train_test_split(
+        df,
+        test_size=test_size,
+        random_state=random_state,
+        stratify=df["label"],
+    )
+    return train_df, test_df, input_name
+
+
+def write_manifest(out_dir: Path, input_name: str, n_train: int, n_test: int, noise_std: float) -> None:
+    # Write a tiny manifest for downstream steps
+    (out_dir / "manifest.txt").write_text(
+        f"input={input_name}\nrows={n_train + n_test}\ntrain={n_train}\ntest={n_test}\nnoise_std={noise_std}\n"
+    )
+
+
+def add_prep_args(parser: argparse.ArgumentParser) -> None:
     parser.add_argument(
         "--raw_data",
         required=False,
         default=None,
         help="Optional CSV path (file/folder). If omitted, fetches OpenML Spambase.",
     )
-    parser.add_argument("--output", required=True)
     parser.add_argument("--test_size", type=float, default=0.2)
-    parser.add_argument("--random_state", type=int, default=42)
     parser.add_argument(
         "--noise_std",
         type=float,
         default=0.0,
         help="Std-dev of Gaussian noise applied to numeric features (simulates drift).",
     )
+    parser.add_argument(
+        "--format",
+        choices=("parquet", "csv"),
+        default="parquet",
+        help="File format for the train/test splits (csv kept for back-compat).",
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--random_state", type=int, default=42)
+    add_prep_args(parser)
     args = parser.parse_args()
 
     out_dir = Path(args.output)
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    input_name = "openml:spambase"
-    if args.raw_data:
-        input_file = _resolve_input_path(args.raw_data)
-        df = pd.read_csv(input_file)
-        input_name = input_file.name
-    else:
-        # Use try/except for sklearn version compatibility
-        # parser="auto" was added in sklearn 1.2+
-        try:
-            spambase = fetch_openml(data_id=44, as_frame=True, parser="auto")
-        except TypeError:
-            # Fallback for sklearn < 1.2
-            spambase = fetch_openml(data_id=44, as_frame=True)
-        df = spambase.frame.rename(columns={"class": "label"})
+    train_df, test_df, input_name = prepare(args.raw_data, args.test_size, args.random_state, args.noise_std)
 
-    if "label" not in df.columns:
-        raise ValueError("Expected a 'label' column in input CSV")
-
-    # Ensure numeric label
-    df["label"] = df["label"].astype(int)
-
-    # Optional noise to mimic drift
-    if args.noise_std and args.noise_std > 0:
-        feature_cols = [c for c in df.columns if c != "label"]
-        rng = np.random.default_rng(args.random_state)
-        noise = rng.normal(loc=0.0, scale=args.noise_std, size=(len(df), len(feature_cols)))
-        df.loc[:, feature_cols] = df[feature_cols].astype(float).values + noise
-
-    # Shuffle + split
-    df = df.sample(frac=1.0, random_state=args.random_state).reset_index(drop=True)
-    split_idx = int(len(df) * (1.0 - args.test_size))
-    train_df = df.iloc[:split_idx].copy()
-    test_df = df.iloc[split_idx:].copy()
-
-    train_path = out_dir / "train.csv"
-    test_path = out_dir / "test.csv"
-    train_df.to_csv(train_path, index=False)
-    test_df.to_csv(test_path, index=False)
-
-    # Write a tiny manifest for downstream steps
-    (out_dir / "manifest.txt").write_text(
-        f"input={input_name}\nrows={len(df)}\ntrain={len(train_df)}\ntest={len(test_df)}\nnoise_std={args.noise_std}\n"
-    )
+    train_path = write_split(train_df, out_dir, "train", args.format)
+    test_path = write_split(test_df, out_dir, "test", args.format)
+    write_manifest(out_dir, input_name, len(train_df), len(test_df), args.noise_std)
 
     print(f"Wrote: {train_path}")
     print(f"Wrote: {test_path}")
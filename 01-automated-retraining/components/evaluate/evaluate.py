@@ -2,33 +2,85 @@ import argparse
 import json
 from pathlib import Path
 
-import pandas as pd
 import mlflow
-from sklearn.metrics import accuracy_score, f1_score
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sklearn.metrics import confusion_matrix
+
+
+def _split_path(data_dir: Path, name: str) -> Path:
+    # Prefer the Parquet split written by data_prep; fall back to legacy CSV outputs.
+    parquet_path = data_dir / f"{name}.parquet"
+    if parquet_path.exists():
+        return parquet_path
+    return data_dir / f"{name}.csv"
+
+
+def _read_split(path: Path) -> tuple[pd.DataFrame, pd.Series]:
+    """Return (float32 features, label) for a split, reading only the columns each needs."""
+    if path.suffix == ".parquet":
+        columns = pq.read_schema(path).names
+        if "label" not in columns:
+            raise ValueError("Expected 'label' column")
+        feature_cols = [c for c in columns if c != "label"]
+        y = pq.read_table(path, columns=["label"]).to_pandas()["label"]
+        # Cast in Arrow so pandas materialises the float32 block directly.
+        table = pq.read_table(path, columns=feature_cols)
+        table = table.cast(pa.schema([pa.field(c, pa.float32()) for c in feature_cols]))
+        return table.to_pandas(), y
+
+    df = pd.read_csv(path)
+    if "label" not in df.columns:
+        raise ValueError("Expected 'label' column")
+    y = df.pop("label")
+    return df.astype(np.float32), y
+
+
+def _binary_metrics(y_true: np.ndarray, y_pred: np.ndarray) -> dict[str, float]:
+    """Accuracy, precision, recall and F1 from a single confusion-matrix pass."""
+    tn, fp, fn, tp = confusion_matrix(y_true, y_pred, labels=[0, 1]).ravel()
+    return {
+        "accuracy": float((tp + tn) / max(tn + fp + fn + tp, 1)),
+        "precision": float(tp / (tp + fp)) if tp + fp else 0.0,
+        "recall": float(tp / (tp + fn)) if tp + fn else 0.0,
+        "f1_score": float(2 * tp / (2 * tp + fp + fn)) if tp else 0.0,
+    }
 
 
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--model", required=True, help="Path to MLflow model folder")
-    parser.add_argument("--test_data", required=True, help="Folder containing test.csv")
+    parser.add_argument("--test_data", required=True, help="Folder containing the test split (.parquet or .csv)")
     parser.add_argument("--min_accuracy", type=float, default=0.90)
     parser.add_argument("--report_output", required=True)
-    parser.add_argument("--deploy_flag", required=True)
+    parser.add_argument(
+        "--model_name",
+        default=None,
+        help="Run the registration approval gate here instead of a separate register step.",
+    )
+    parser.add_argument(
+        "--use_pyfunc",
+        action="store_true",
+        help="Score through the MLflow pyfunc wrapper instead of the raw sklearn model.",
+    )
     args = parser.parse_args()
 
-    test_path = Path(args.test_data) / "test.csv"
-    df = pd.read_csv(test_path)
-    if "label" not in df.columns:
-        raise ValueError("Expected 'label' column")
-
-    X = df.drop(columns=["label"])
-    y = df["label"].astype(int)
+    X, y = _read_split(_split_path(Path(args.test_data), "test"))
+    y = y.astype(np.int8)
 
-    model = mlflow.pyfunc.load_model(args.model)
+    if args.use_pyfunc:
+        model = mlflow.pyfunc.load_model(args.model)
+    else:
+        # Skip the pyfunc schema enforcement; X is already the float32 matrix the trees
+        # use, and passing the frame keeps the feature names the model was fitted with.
+        model = mlflow.sklearn.load_model(args.model)
     y_pred = model.predict(X)
 
-    acc = float(accuracy_score(y, y_pred))
-    f1 = float(f1_score(y, y_pred))
+    metrics = _binary_metrics(y, y_pred)
+    acc = metrics["accuracy"]
+    f1 = metrics["f1_score"]
 
     approved = acc >= args.min_accuracy
 
@@ -43,14 +95,18 @@ def main() -> None:
     report_path.parent.mkdir(parents=True, exist_ok=True)
     report_path.write_text(json.dumps(report, indent=2))
 
-    flag_path = Path(args.deploy_flag)
-    flag_path.parent.mkdir(parents=True, exist_ok=True)
-    flag_path.write_text("1" if approved else "0")
-
     print("Evaluation report:")
     print(json.dumps(report, indent=2))
     print("Approved:", approved)
 
+    if args.model_name:
+        # Same gate as components/register/register.py, without its extra pipeline step.
+        if approved:
+            print(f"Model approved for deployment. Model name: {args.model_name}")
+            print(f"Model path: {args.model}")
+        else:
+            print("Model not approved; skipping registration step.")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,42 @@
+"""Fused data-prep + training step.
+
+Runs prep.py and train.py in one process so the train split never leaves memory:
+no upload of the prepared folder, no download and re-parse in a second container.
+Only the test split is written, for the evaluate step.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# The component is uploaded with the whole components/ folder as its code.
+COMPONENTS_DIR = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(COMPONENTS_DIR / "data_prep"), str(COMPONENTS_DIR / "train")]
+
+import prep  # noqa: E402
+import train  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--test_output", required=True, help="Folder to write the test split to")
+    parser.add_argument("--random_state", type=int, default=42)
+    prep.add_prep_args(parser)
+    train.add_train_args(parser)
+    args = parser.parse_args()
+
+    train_df, test_df, input_name = prep.prepare(args.raw_data, args.test_size, args.random_state, args.noise_std)
+
+    out_dir = Path(args.test_output)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    test_path = prep.write_split(test_df, out_dir, "test", args.format)
+    prep.write_manifest(out_dir, input_name, len(train_df), len(test_df), args.noise_std)
+    print(f"Wrote: {test_path}")
+
+    y_train = train_df.pop("label")
+    y_test = test_df.pop("label")
+    train.train(args, train_df, y_train, test_df, y_test)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,17 @@
 import argparse
+import json
 from pathlib import Path
 
 
 def main() -> None:
     parser = argparse.ArgumentParser()
-    parser.add_argument("--deploy_flag", required=True)
+    parser.add_argument("--evaluation_report", required=True, help="JSON report written by evaluate.py")
     parser.add_argument("--model_name", required=True)
     parser.add_argument("--model", required=True)
     args = parser.parse_args()
 
-    flag = Path(args.deploy_flag).read_text().strip()
-    if flag != "1":
+    report = json.loads(Path(args.evaluation_report).read_text())
+    if not report.get("approved"):
         print("Model not approved; skipping registration step.")
         return
 
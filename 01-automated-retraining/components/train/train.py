@@ -4,44 +4,154 @@ import os
 from pathlib import Path
 
 import mlflow
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from mlflow.models import infer_signature
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+from sklearn.metrics import confusion_matrix, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+
+def _split_path(data_dir: Path, name: str) -> Path:
+    # Prefer the Parquet split written by data_prep; fall back to legacy CSV outputs.
+    parquet_path = data_dir / f"{name}.parquet"
+    if parquet_path.exists():
+        return parquet_path
+    return data_dir / f"{name}.csv"
+
+
+def _read_split(path: Path) -> tuple[pd.DataFrame, pd.Series]:
+    """Return (float32 features, label) for a split, reading only the columns each needs."""
+    if path.suffix == ".parquet":
+        columns = pq.read_schema(path).names
+        if "label" not in columns:
+            raise ValueError("Expected 'label' column")
+        feature_cols = [c for c in columns if c != "label"]
+        y = pq.read_table(path, columns=["label"]).to_pandas()["label"]
+        # Cast in Arrow so pandas materialises the float32 block directly.
+        table = pq.read_table(path, columns=feature_cols)
+        table = table.cast(pa.schema([pa.field(c, pa.float32()) for c in feature_cols]))
+        return table.to_pandas(), y
+
+    df = pd.read_csv(path)
+    if "label" not in df.columns:
+        raise ValueError("Expected 'label' column")
+    y = df.pop("label")
+    return df.astype(np.float32), y
+
+
+def _binary_metrics(y_true: np.ndarray, y_pred: np.ndarray) -> dict[str, float]:
+    """Accuracy, precision, recall and F1 from a single confusion-matrix pass."""
+    tn, fp, fn, tp = confusion_matrix(y_true, y_pred, labels=[0, 1]).ravel()
+    return {
+        "accuracy": float((tp + tn) / max(tn + fp + fn + tp, 1)),
+        "precision": float(tp / (tp + fp)) if tp + fp else 0.0,
+        "recall": float(tp / (tp + fn)) if tp + fn else 0.0,
+        "f1_score": float(2 * tp / (2 * tp + fp + fn)) if tp else 0.0,
+    }
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--data", required=True, help="Folder containing train.csv and test.csv")
+def _physical_cpu_count() -> int:
+    try:
+        import psutil
+    except ImportError:
+        return os.cpu_count() or 1
+    return psutil.cpu_count(logical=False) or os.cpu_count() or 1
+
+
+def _fit_with_early_stopping(
+    model: RandomForestClassifier,
+    X_fit: pd.DataFrame,
+    y_fit: np.ndarray,
+    X_val: pd.DataFrame,
+    y_val: np.ndarray,
+    max_trees: int,
+    step: int,
+    tol: float = 1e-3,
+    patience: int = 2,
+) -> RandomForestClassifier:
+    """Grow the forest `step` trees at a time until validation accuracy has not improved by
+    `tol` for `patience` consecutive rounds (one row of a small slice can flip a round)."""
+    model.set_params(warm_start=True, n_estimators=min(step, max_trees))
+    X_val = X_val.to_numpy(dtype=np.float32)
+    votes = np.zeros((len(X_val), np.unique(y_fit).size))
+    best = -1.0
+    stale = 0
+    while True:
+        n_before = len(getattr(model, "estimators_", []))
+        model.fit(X_fit, y_fit)
+        # Only the trees added this round need scoring; earlier votes are kept.
+        for tree in model.estimators_[n_before:]:
+            votes += tree.predict_proba(X_val)
+        score = float(np.mean(model.classes_[votes.argmax(axis=1)] == y_val))
+        if score - best >= tol:
+            best, stale = score, 0
+        else:
+            stale += 1
+        if stale >= patience or model.n_estimators >= max_trees:
+            break
+        model.n_estimators = min(model.n_estimators + step, max_trees)
+    model.set_params(warm_start=False)
+    return model
+
+
+def add_train_args(parser: argparse.ArgumentParser) -> None:
     parser.add_argument("--n_estimators", type=int, default=200)
     parser.add_argument("--max_depth", type=int, default=12)
-    parser.add_argument("--random_state", type=int, default=42)
+    parser.add_argument(
+        "--n_jobs",
+        type=int,
+        default=0,
+        help="Parallel jobs for tree building (0 = number of physical cores).",
+    )
+    parser.add_argument(
+        "--tree_step",
+        type=int,
+        default=0,
+        help="Opt-in early stopping: grow the forest this many trees at a time on the train "
+        "split minus --val_size and stop once validation accuracy plateaus, with "
+        "--n_estimators as the cap (0 = fit exactly --n_estimators trees on the full split).",
+    )
+    parser.add_argument(
+        "--val_size",
+        type=float,
+        default=0.1,
+        help="Fraction of the train split held out for early stopping (not used for the final fit).",
+    )
+    parser.add_argument(
+        "--tree_patience",
+        type=int,
+        default=2,
+        help="Stop growing after this many consecutive --tree_step rounds without a "
+        "validation accuracy gain.",
+    )
     parser.add_argument("--model_output", required=True)
     parser.add_argument("--metrics_output", required=True)
     parser.add_argument("--registered_model_name", default="spam-classifier")
-    args = parser.parse_args()
 
-    data_dir = Path(args.data)
-    train_path = data_dir / "train.csv"
-    test_path = data_dir / "test.csv"
 
-    train_df = pd.read_csv(train_path)
-    test_df = pd.read_csv(test_path)
-
-    if "label" not in train_df.columns:
-        raise ValueError("Expected 'label' column")
-
-    X_train = train_df.drop(columns=["label"])
-    y_train = train_df["label"].astype(int)
-
-    X_test = test_df.drop(columns=["label"])
-    y_test = test_df["label"].astype(int)
+def train(
+    args: argparse.Namespace,
+    X_train: pd.DataFrame,
+    y_train: pd.Series,
+    X_test: pd.DataFrame,
+    y_test: pd.Series,
+) -> dict[str, float]:
+    """Fit, log and save the model described by `args`; returns the test metrics."""
+    # Trees are grown on float32 features in threads that share X; float32 frames (what
+    # _read_split returns) pass through here and through fit() without a converted copy.
+    X_train = X_train.astype(np.float32, copy=False)
+    X_test = X_test.astype(np.float32, copy=False)
+    y_train = y_train.astype(np.int8)
+    y_test = y_test.astype(np.int8)
 
     params = {
         "n_estimators": args.n_estimators,
         "max_depth": args.max_depth,
         "random_state": args.random_state,
-        "n_jobs": -1,
+        "n_jobs": args.n_jobs or _physical_cpu_count(),
     }
 
     # Azure ML usually injects tracking URI automatically; allow override.
@@ -51,27 +161,52 @@ def main() -> None:
 
     with mlflow.start_run() as run:
         mlflow.log_params(params)
-        mlflow.log_param("training_rows", len(train_df))
-        mlflow.log_param("test_rows", len(test_df))
+        mlflow.log_param("test_rows", len(X_test))
         mlflow.log_param("features", X_train.shape[1])
 
         model = RandomForestClassifier(**params)
-        model.fit(X_train, y_train)
+        X_fit = X_train
+        if args.tree_step > 0:
+            # Early stopping is judged on a slice of train, never on the test split.
+            X_fit, X_val, y_fit, y_val = train_test_split(
+                X_fit,
+                y_train.to_numpy(),
+                test_size=args.val_size,
+                random_state=args.random_state,
+                stratify=y_train,
+            )
+            mlflow.log_param("val_size", args.val_size)
+            mlflow.log_param("val_rows", len(X_val))
+            model = _fit_with_early_stopping(
+                model,
+                X_fit,
+                y_fit,
+                X_val,
+                y_val,
+                max_trees=args.n_estimators,
+                step=args.tree_step,
+                patience=args.tree_patience,
+            )
+        else:
+            model.fit(X_fit, y_train.to_numpy())
+        # Rows the final forest was actually fitted on (the validation slice is excluded).
+        mlflow.log_param("training_rows", len(X_fit))
+        mlflow.log_param("n_estimators_fitted", len(model.estimators_))
 
-        y_pred = model.predict(X_test)
-        y_proba = model.predict_proba(X_test)[:, 1]
+        # One forest traversal: predict() is just the argmax over predict_proba().
+        proba = model.predict_proba(X_test)
+        y_pred = model.classes_[proba.argmax(axis=1)]
+        y_proba = proba[:, 1]
 
-        metrics = {
-            "accuracy": float(accuracy_score(y_test, y_pred)),
-            "precision": float(precision_score(y_test, y_pred)),
-            "recall": float(recall_score(y_test, y_pred)),
-            "f1_score": float(f1_score(y_test, y_pred)),
-            "roc_auc": float(roc_auc_score(y_test, y_proba)),
-        }
+        metrics = _binary_metrics(y_test, y_pred)
+        metrics["roc_auc"] = float(roc_auc_score(y_test, y_proba))
 
         mlflow.log_metrics(metrics)
 
-        signature = infer_signature(X_train, model.predict(X_train))
+        # The signature only needs column names/dtypes, so a few rows are enough. Declare
+        # double inputs: scoring clients send float64 and MLflow upcasts float32 safely.
+        sample = X_train.head(5).astype(np.float64)
+        signature = infer_signature(sample, model.predict(sample))
 
         # Save MLflow model to pipeline output
         model_out = Path(args.model_output)
@@ -80,14 +215,11 @@ def main() -> None:
         mlflow.sklearn.save_model(model, path=str(model_out), signature=signature)
 
         # Also register into Azure ML model registry via MLflow, so the workshop can demo governance.
+        # Upload the folder saved above instead of log_model(), which would pickle the forest again.
         # If registration fails (permissions, etc.), keep the run successful.
         try:
-            mlflow.sklearn.log_model(
-                model,
-                artifact_path="model",
-                signature=signature,
-                registered_model_name=args.registered_model_name,
-            )
+            mlflow.log_artifacts(str(model_out), artifact_path="model")
+            mlflow.register_model(f"runs:/{run.info.run_id}/model", args.registered_model_name)
         except Exception as e:
             print(f"WARN: MLflow registration skipped/failed: {e}")
 
@@ -99,6 +231,21 @@ def main() -> None:
         print("Run ID:", run.info.run_id)
         print("Metrics:", metrics)
 
+        return metrics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", required=True, help="Folder containing train/test splits (.parquet or .csv)")
+    parser.add_argument("--random_state", type=int, default=42)
+    add_train_args(parser)
+    args = parser.parse_args()
+
+    data_dir = Path(args.data)
+    X_train, y_train = _read_split(_split_path(data_dir, "train"))
+    X_test, y_test = _read_split(_split_path(data_dir, "test"))
+    train(args, X_train, y_train, X_test, y_test)
+
 
 if __name__ == "__main__":
     main()
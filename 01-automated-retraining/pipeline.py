@@ -74,6 +74,36 @@ train_component = command(
         --model_output ${{outputs.model}} \
         --metrics_output ${{outputs.metrics}}""",
     environment=PIPELINE_ENV,
+    # RandomForest parallelises across trees; keep BLAS/OpenMP pools from nesting inside it.
+    environment_variables={"OMP_NUM_THREADS": "1", "MKL_NUM_THREADS": "1"},
+)
+
+# Fused Prep + Train Component: one container, the train split stays in memory
+prep_train_component = command(
+    name="prep_and_train_model",
+    display_name="Prepare Data and Train Model",
+    description="Fetch/split OpenML Spambase and train with MLflow tracking in a single step",
+    inputs={
+        "noise_std": Input(type="number", default=0.0),
+        "n_estimators": Input(type="integer", default=100),
+        "max_depth": Input(type="integer", default=12),
+    },
+    outputs={
+        "test_data": Output(type="uri_folder"),
+        "model": Output(type="mlflow_model"),
+        "metrics": Output(type="uri_file"),
+    },
+    # Whole components/ folder so the script can import prep.py and train.py.
+    code=str(COMPONENTS_DIR),
+    command="""python prep_train/prep_and_train.py \
+        --noise_std ${{inputs.noise_std}} \
+        --n_estimators ${{inputs.n_estimators}} \
+        --max_depth ${{inputs.max_depth}} \
+        --test_output ${{outputs.test_data}} \
+        --model_output ${{outputs.model}} \
+        --metrics_output ${{outputs.metrics}}""",
+    environment=PIPELINE_ENV,
+    environment_variables={"OMP_NUM_THREADS": "1", "MKL_NUM_THREADS": "1"},
 )
 
 # Evaluation Component
@@ -88,15 +118,37 @@ evaluate_component = command(
     },
     outputs={
         "evaluation_report": Output(type="uri_file"),
-        "deploy_flag": Output(type="uri_file"),
     },
     code=str(COMPONENTS_DIR / "evaluate"),
     command="""python evaluate.py \
         --model ${{inputs.model}} \
         --test_data ${{inputs.test_data}} \
         --min_accuracy ${{inputs.min_accuracy}} \
-        --report_output ${{outputs.evaluation_report}} \
-        --deploy_flag ${{outputs.deploy_flag}}""",
+        --report_output ${{outputs.evaluation_report}}""",
+    environment=PIPELINE_ENV,
+)
+
+# Evaluation + approval gate in one step (used by the fused pipeline)
+evaluate_and_gate_component = command(
+    name="evaluate_and_gate_model",
+    display_name="Evaluate and Approve Model",
+    description="Compare new model against the accuracy threshold and apply the registration gate",
+    inputs={
+        "model": Input(type="mlflow_model"),
+        "test_data": Input(type="uri_folder"),
+        "min_accuracy": Input(type="number", default=0.90),
+        "model_name": Input(type="string"),
+    },
+    outputs={
+        "evaluation_report": Output(type="uri_file"),
+    },
+    code=str(COMPONENTS_DIR / "evaluate"),
+    command="""python evaluate.py \
+        --model ${{inputs.model}} \
+        --test_data ${{inputs.test_data}} \
+        --min_accuracy ${{inputs.min_accuracy}} \
+        --model_name ${{inputs.model_name}} \
+        --report_output ${{outputs.evaluation_report}}""",
     environment=PIPELINE_ENV,
 )
 
@@ -107,13 +159,13 @@ register_component = command(
     description="Register model if it passes evaluation",
     inputs={
         "model": Input(type="mlflow_model"),
-        "deploy_flag": Input(type="uri_file"),
+        "evaluation_report": Input(type="uri_file"),
         "model_name": Input(type="string"),
     },
     code=str(COMPONENTS_DIR / "register"),
     command="""python register.py \
         --model ${{inputs.model}} \
-        --deploy_flag ${{inputs.deploy_flag}} \
+        --evaluation_report ${{inputs.evaluation_report}} \
         --model_name ${{inputs.model_name}}""",
     environment=PIPELINE_ENV,
 )
@@ -165,7 +217,7 @@ def retraining_pipeline(
     # Step 4: Register if approved
     register_step = register_component(
         model=train_step.outputs.model,
-        deploy_flag=eval_step.outputs.deploy_flag,
+        evaluation_report=eval_step.outputs.evaluation_report,
         model_name=model_name,
     )
     
@@ -176,6 +228,56 @@ def retraining_pipeline(
     }
 
 
+@dsl.pipeline(
+    name="automated-retraining-pipeline-fused",
+    description="Retraining pipeline with data prep and training fused into one step",
+    compute="cpu-cluster",
+)
+def fused_retraining_pipeline(
+    n_estimators: int = 100,
+    max_depth: int = 12,
+    min_accuracy: float = 0.90,
+    noise_std: float = 0.0,
+    model_name: str = "classification-model",
+):
+    """
+    Automated Retraining Pipeline (fused)
+
+    Same stages as retraining_pipeline in two containers instead of four: prep + train
+    share one, so the train split never round-trips through Blob storage, and the
+    registration gate runs inside the evaluation step.
+    """
+
+    # Steps 1+2: Prepare data and train model
+    train_step = prep_train_component(
+        noise_std=noise_std,
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+    )
+
+    # Steps 3+4: Evaluate on the test split written by the fused step and apply the gate
+    eval_step = evaluate_and_gate_component(
+        model=train_step.outputs.model,
+        test_data=train_step.outputs.test_data,
+        min_accuracy=min_accuracy,
+        model_name=model_name,
+    )
+
+    return {
+        "model": train_step.outputs.model,
+        "metrics": train_step.outputs.metrics,
+        "evaluation_report": eval_step.outputs.evaluation_report,
+    }
+
+
+# Selected by the submit scripts via PIPELINE_MODE. "staged" (the default) keeps one step per
+# stage for the demo; "fused" is opt-in.
+PIPELINES = {
+    "fused": fused_retraining_pipeline,
+    "staged": retraining_pipeline,
+}
+
+
 # =============================================================================
 # PIPELINE EXECUTION
 # =============================================================================
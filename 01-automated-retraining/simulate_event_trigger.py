@@ -14,7 +14,7 @@ import os
 import time
 from pathlib import Path
 
-from pipeline import ml_client, retraining_pipeline
+from pipeline import PIPELINES, ml_client
 
 
 def main() -> None:
@@ -24,7 +24,11 @@ def main() -> None:
     noise_std = float(os.getenv("TRIGGER_NOISE_STD", "0.005"))
     _ = Path(__file__).resolve().parent  # keeps parity with other scripts
 
-    pipeline_job = retraining_pipeline(
+    pipeline_mode = os.getenv("PIPELINE_MODE", "staged")
+    if pipeline_mode not in PIPELINES:
+        raise ValueError(f"PIPELINE_MODE must be one of {sorted(PIPELINES)}, got {pipeline_mode!r}")
+
+    pipeline_job = PIPELINES[pipeline_mode](
         n_estimators=int(os.getenv("N_ESTIMATORS", "200")),
         max_depth=int(os.getenv("MAX_DEPTH", "12")),
         min_accuracy=float(os.getenv("MIN_ACCURACY", "0.90")),
@@ -8,6 +8,7 @@ Usage (PowerShell):
     $env:AZURE_SUBSCRIPTION_ID = "..."
     $env:AZURE_RESOURCE_GROUP = "rg-dnd-mlops-demo"
     $env:AZURE_ML_WORKSPACE = "mlw-<something>-dev"
+    $env:PIPELINE_MODE = "fused"    # optional: fused prep+train instead of one step per stage
     python ./01-automated-retraining/submit_pipeline.py
 """
 
@@ -15,14 +16,18 @@ import os
 import time
 from pathlib import Path
 
-from pipeline import ml_client, retraining_pipeline
+from pipeline import PIPELINES, ml_client
 
 
 def main() -> None:
     run_suffix = time.strftime("%Y%m%d-%H%M%S")
     experiment_name = os.getenv("AML_EXPERIMENT_NAME", "automated-retraining")
 
-    pipeline_job = retraining_pipeline(
+    pipeline_mode = os.getenv("PIPELINE_MODE", "staged")
+    if pipeline_mode not in PIPELINES:
+        raise ValueError(f"PIPELINE_MODE must be one of {sorted(PIPELINES)}, got {pipeline_mode!r}")
+
+    pipeline_job = PIPELINES[pipeline_mode](
         n_estimators=int(os.getenv("N_ESTIMATORS", "200")),
         max_depth=int(os.getenv("MAX_DEPTH", "12")),
         min_accuracy=float(os.getenv("MIN_ACCURACY", "0.90")),
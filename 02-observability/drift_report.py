@@ -19,23 +19,58 @@ from __future__ import annotations
 
 import argparse
 import json
+import math
+import os
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import mlflow
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from sklearn.datasets import fetch_openml
 
+try:
+    from numba import njit
+except ImportError:  # optional: the NumPy implementations below are used instead
+    njit = None
+
+
+def _openml_cache_dir() -> Path:
+    return Path(os.getenv("XDG_CACHE_HOME", Path.home() / ".cache")) / "mlops-workshop"
+
+
+def _cached_openml(data_id: int) -> pd.DataFrame:
+    """Fetch an OpenML dataset as a DataFrame, caching the parsed frame as Parquet."""
+    cache_dir = _openml_cache_dir()
+    cache_path = cache_dir / f"openml-{data_id}.parquet"
+    if cache_path.exists():
+        return pq.read_table(cache_path).to_pandas()
 
-def _load_openml_spambase(data_id: int = 44) -> pd.DataFrame:
     # Use try/except for sklearn version compatibility
     # parser="auto" was added in sklearn 1.2+
+    data_home = str(cache_dir / "openml")
     try:
-        spambase = fetch_openml(data_id=data_id, as_frame=True, parser="auto")
+        bunch = fetch_openml(data_id=data_id, as_frame=True, parser="auto", data_home=data_home)
     except TypeError:
         # Fallback for sklearn < 1.2
-        spambase = fetch_openml(data_id=data_id, as_frame=True)
-    df = spambase.frame.rename(columns={"class": "label"})
+        bunch = fetch_openml(data_id=data_id, as_frame=True, data_home=data_home)
+    df = bunch.frame
+
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(".parquet.tmp")
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+        tmp_path.replace(cache_path)
+    except OSError as e:
+        print(f"[WARN] Could not cache OpenML dataset {data_id}: {e}")
+    return df
+
+
+def _load_openml_spambase(data_id: int = 44) -> pd.DataFrame:
+    df = _cached_openml(data_id).rename(columns={"class": "label"})
     df["label"] = df["label"].astype(int)
     return df
 
@@ -46,63 +81,205 @@ def _apply_gaussian_noise(df: pd.DataFrame, noise_std: float, seed: int = 123) -
 
     feature_cols = [c for c in df.columns if c != "label"]
     rng = np.random.default_rng(seed)
-    noise = rng.normal(0.0, noise_std, size=(len(df), len(feature_cols)))
-    df_out = df.copy()
-    df_out.loc[:, feature_cols] = df_out[feature_cols].astype(float).values + noise
+    # One float64 copy of the features, noised in place; the frame wraps it without copying.
+    arr = df[feature_cols].to_numpy(dtype=float, copy=True)
+    arr += rng.normal(0.0, noise_std, size=arr.shape)
+    df_out = pd.DataFrame(arr, index=df.index, columns=feature_cols)
+    if "label" in df.columns:
+        df_out.insert(df.columns.get_loc("label"), "label", df["label"])
     return df_out
 
 
-def _psi(expected: np.ndarray, actual: np.ndarray, bins: int = 10) -> float:
-    """Population Stability Index for numeric arrays."""
-    expected = expected[np.isfinite(expected)]
-    actual = actual[np.isfinite(actual)]
-    if expected.size == 0 or actual.size == 0:
-        return float("nan")
-
-    quantiles = np.linspace(0, 1, bins + 1)
-    breakpoints = np.unique(np.quantile(expected, quantiles))
-    if breakpoints.size < 3:
-        return 0.0
-
-    expected_counts, _ = np.histogram(expected, bins=breakpoints)
-    actual_counts, _ = np.histogram(actual, bins=breakpoints)
-
-    expected_pct = expected_counts / max(expected_counts.sum(), 1)
-    actual_pct = actual_counts / max(actual_counts.sum(), 1)
-
+def _psi_from_pct(expected_pct: np.ndarray, actual_pct: np.ndarray) -> np.ndarray:
+    """PSI per row of two (n_features, n_bins) bin-share matrices."""
     eps = 1e-6
     expected_pct = np.clip(expected_pct, eps, 1)
     actual_pct = np.clip(actual_pct, eps, 1)
-
-    return float(np.sum((actual_pct - expected_pct) * np.log(actual_pct / expected_pct)))
+    return np.sum((actual_pct - expected_pct) * np.log(actual_pct / expected_pct), axis=1)
 
 
-def _js_divergence(p: np.ndarray, q: np.ndarray) -> float:
+def _js_divergence(p: np.ndarray, q: np.ndarray) -> np.ndarray:
     eps = 1e-12
     p = np.clip(p, eps, 1)
     q = np.clip(q, eps, 1)
     m = 0.5 * (p + q)
-    return float(0.5 * (np.sum(p * np.log(p / m)) + np.sum(q * np.log(q / m))))
+    return 0.5 * (np.sum(p * np.log(p / m), axis=-1) + np.sum(q * np.log(q / m), axis=-1))
+
+
+def _psi_loop(expected_pct: np.ndarray, actual_pct: np.ndarray) -> np.ndarray:
+    out = np.empty(expected_pct.shape[0])
+    for i in range(expected_pct.shape[0]):
+        total = 0.0
+        for j in range(expected_pct.shape[1]):
+            e = min(max(expected_pct[i, j], 1e-6), 1.0)
+            a = min(max(actual_pct[i, j], 1e-6), 1.0)
+            total += (a - e) * math.log(a / e)
+        out[i] = total
+    return out
+
+
+def _js_loop(p: np.ndarray, q: np.ndarray) -> np.ndarray:
+    out = np.empty(p.shape[0])
+    for i in range(p.shape[0]):
+        p_total = 0.0
+        q_total = 0.0
+        for j in range(p.shape[1]):
+            pj = min(max(p[i, j], 1e-12), 1.0)
+            qj = min(max(q[i, j], 1e-12), 1.0)
+            m = 0.5 * (pj + qj)
+            p_total += pj * math.log(pj / m)
+            q_total += qj * math.log(qj / m)
+        out[i] = 0.5 * (p_total + q_total)
+    return out
+
+
+if njit is not None:
+    # Same math as the NumPy versions without the clip/log temporaries; nogil so the
+    # thread pool in _feature_drift can run blocks concurrently.
+    _psi_from_pct = njit(fastmath=True, cache=True, nogil=True)(_psi_loop)
+    _js_divergence = njit(fastmath=True, cache=True, nogil=True)(_js_loop)
+
+
+def _finite_matrix(df: pd.DataFrame, cols: list[str]) -> np.ndarray:
+    """Columns as a float64 (n_rows, n_features) matrix with non-finite entries set to NaN."""
+    arr = df[cols].to_numpy(dtype=np.float64, copy=True)
+    arr[~np.isfinite(arr)] = np.nan
+    return arr
+
+
+def _bin_counts(x: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Per-column histogram counts of an (n_rows, n_features) matrix.
+
+    ``edges`` is (n_edges, n_features), sorted along axis 0 and possibly with repeated
+    values. Counts land in the same bins as ``np.histogram`` on the unique edges of
+    each column (repeated edges only add empty bins); NaNs are ignored.
+    """
+    n_edges, n_feat = edges.shape
+    # Edges <= value, i.e. np.searchsorted(edges[:, j], x[:, j], side="right") per column,
+    # accumulated one edge at a time into two (n_rows, n_features) buffers.
+    idx = np.zeros(x.shape, dtype=np.intp)
+    mask = np.empty(x.shape, dtype=bool)
+    for edge in edges:
+        np.greater_equal(x, edge, out=mask)
+        idx += mask
+    # Last bin is closed on the right; values outside [edges[0], edges[-1]] are dropped.
+    n_last = (edges == edges[-1]).sum(axis=0)
+    np.equal(x, edges[-1], out=mask)
+    np.copyto(idx, n_edges - n_last, where=mask)
+    idx += np.arange(n_feat) * (n_edges + 1)
+    counts = np.bincount(idx.ravel(), minlength=n_feat * (n_edges + 1))
+    return counts.reshape(n_feat, n_edges + 1)[:, 1:-1]
+
+
+def _uniform_bin_counts(x: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """``_bin_counts`` for equal-width edges, computing the bin index arithmetically.
+
+    Mirrors np.histogram's uniform-bins path: scale to a bin index, then nudge values
+    that rounding put one bin off so the edge comparisons match ``_bin_counts`` exactly.
+    """
+    n_edges, n_feat = edges.shape
+    n_bins = n_edges - 1
+    lo, hi = edges[0], edges[-1]
+    inside = (x >= lo) & (x <= hi)
+    x = np.where(inside, x, lo)
+    idx = ((x - lo) * (n_bins / (hi - lo))).astype(np.intp)
+    np.minimum(idx, n_bins - 1, out=idx)
+    cols = np.arange(n_feat)
+    idx -= x < edges[idx, cols]
+    idx += (x >= edges[idx + 1, cols]) & (idx != n_bins - 1)
+    # Values outside the range (and NaNs) go to one trailing overflow slot.
+    flat = np.where(inside, idx + cols * n_bins, n_feat * n_bins)
+    counts = np.bincount(flat.ravel(), minlength=n_feat * n_bins + 1)
+    return counts[:-1].reshape(n_feat, n_bins)
+
+
+def _psi(expected: np.ndarray, actual: np.ndarray, bins: int = 10) -> np.ndarray:
+    """Population Stability Index per column of two (n_rows, n_features) matrices."""
+    valid = (np.isfinite(expected).any(axis=0)) & (np.isfinite(actual).any(axis=0))
+    out = np.full(expected.shape[1], np.nan)
+    if not valid.any():
+        return out
 
+    quantiles = np.linspace(0, 1, bins + 1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns
+        if np.isnan(expected).any():
+            breakpoints = np.nanquantile(expected, quantiles, axis=0)
+        else:
+            breakpoints = np.quantile(expected, quantiles, axis=0)
+    n_unique = 1 + (np.diff(breakpoints, axis=0) > 0).sum(axis=0)
+
+    expected_counts = _bin_counts(expected, breakpoints)
+    actual_counts = _bin_counts(actual, breakpoints)
+
+    expected_pct = expected_counts / np.maximum(expected_counts.sum(axis=1, keepdims=True), 1)
+    actual_pct = actual_counts / np.maximum(actual_counts.sum(axis=1, keepdims=True), 1)
+
+    psi = np.where(n_unique < 3, 0.0, _psi_from_pct(expected_pct, actual_pct))
+    return np.where(valid, psi, out)
+
+
+def _hist_jsd(x: np.ndarray, y: np.ndarray, bins: int = 20) -> np.ndarray:
+    """Histogram Jensen-Shannon divergence per column of two (n_rows, n_features) matrices."""
+    valid = (np.isfinite(x).any(axis=0)) & (np.isfinite(y).any(axis=0))
+    out = np.full(x.shape[1], np.nan)
+    if not valid.any():
+        return out
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns
+        lo = np.minimum(np.nanmin(x, axis=0), np.nanmin(y, axis=0))
+        hi = np.maximum(np.nanmax(x, axis=0), np.nanmax(y, axis=0))
+    constant = lo == hi
+    # Placeholder range for columns whose result is overridden below.
+    skip = ~valid | constant
+    lo = np.where(skip, 0.0, lo)
+    hi = np.where(skip, 1.0, hi)
+
+    edges = np.linspace(lo, hi, bins + 1)
+    widths = np.diff(edges, axis=0).T
+
+    # Same normalisation as np.histogram(..., density=True) followed by sum-to-one.
+    x_counts = _uniform_bin_counts(x, edges)
+    y_counts = _uniform_bin_counts(y, edges)
+    x_hist = x_counts / widths
+    y_hist = y_counts / widths
+    x_hist /= np.maximum(x_counts.sum(axis=1, keepdims=True), 1)
+    y_hist /= np.maximum(y_counts.sum(axis=1, keepdims=True), 1)
+    x_hist /= np.maximum(x_hist.sum(axis=1, keepdims=True), 1e-12)
+    y_hist /= np.maximum(y_hist.sum(axis=1, keepdims=True), 1e-12)
+
+    jsd = np.where(constant, 0.0, _js_divergence(x_hist, y_hist))
+    return np.where(valid, jsd, out)
+
+
+def _physical_cpu_count() -> int:
+    try:
+        import psutil
+    except ImportError:
+        return os.cpu_count() or 1
+    return psutil.cpu_count(logical=False) or os.cpu_count() or 1
 
-def _hist_jsd(x: np.ndarray, y: np.ndarray, bins: int = 20) -> float:
-    x = x[np.isfinite(x)]
-    y = y[np.isfinite(y)]
-    if x.size == 0 or y.size == 0:
-        return float("nan")
 
-    lo = float(min(np.min(x), np.min(y)))
-    hi = float(max(np.max(x), np.max(y)))
-    if lo == hi:
-        return 0.0
+def _feature_drift(b: np.ndarray, p: np.ndarray, bins: int, n_jobs: int) -> tuple[np.ndarray, np.ndarray]:
+    """PSI and JSD per feature, with blocks of features spread over a thread pool.
 
-    x_hist, edges = np.histogram(x, bins=bins, range=(lo, hi), density=True)
-    y_hist, _ = np.histogram(y, bins=edges, density=True)
+    The kernels are NumPy-bound and release the GIL, so threads avoid copying the
+    matrices into worker processes.
+    """
+    jsd_bins = max(10, bins * 2)
+    n_blocks = max(1, min(n_jobs, b.shape[1]))
+    if n_blocks == 1:
+        return _psi(b, p, bins=bins), _hist_jsd(b, p, bins=jsd_bins)
 
-    x_hist = x_hist / max(x_hist.sum(), 1e-12)
-    y_hist = y_hist / max(y_hist.sum(), 1e-12)
+    def run(block: tuple[np.ndarray, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        b_block, p_block = block
+        return _psi(b_block, p_block, bins=bins), _hist_jsd(b_block, p_block, bins=jsd_bins)
 
-    return _js_divergence(x_hist, y_hist)
+    blocks = zip(np.array_split(b, n_blocks, axis=1), np.array_split(p, n_blocks, axis=1), strict=True)
+    with ThreadPoolExecutor(max_workers=n_blocks) as executor:
+        results = list(executor.map(run, blocks))
+    return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
 
 
 def main() -> None:
@@ -114,6 +291,12 @@ def main() -> None:
     parser.add_argument("--production_noise_std", type=float, default=0.01)
     parser.add_argument("--out_json", required=True)
     parser.add_argument("--bins", type=int, default=10)
+    parser.add_argument(
+        "--n_jobs",
+        type=int,
+        default=0,
+        help="Threads for the per-feature drift metrics (0 = number of physical cores).",
+    )
     args = parser.parse_args()
 
     if args.baseline_csv and args.production_csv:
@@ -152,17 +335,14 @@ def main() -> None:
         "production_null_rate": float(prod[all_cols].isna().mean().mean()) if all_cols else 0.0,
     }
 
-    # Drift per numeric feature
-    drift_metrics: dict[str, dict[str, float]] = {}
+    # Drift per numeric feature, computed for all features at once
     numeric_cols = [c for c in all_cols if c != "label" and pd.api.types.is_numeric_dtype(baseline[c])]
-
-    for col in numeric_cols:
-        b = baseline[col].to_numpy(dtype=float)
-        p = prod[col].to_numpy(dtype=float)
-        drift_metrics[col] = {
-            "psi": _psi(b, p, bins=args.bins),
-            "jsd": _hist_jsd(b, p, bins=max(10, args.bins * 2)),
-        }
+    b = _finite_matrix(baseline, numeric_cols)
+    p = _finite_matrix(prod, numeric_cols)
+    psi, jsd = _feature_drift(b, p, bins=args.bins, n_jobs=args.n_jobs or _physical_cpu_count())
+    drift_metrics: dict[str, dict[str, float]] = {
+        col: {"psi": float(psi[j]), "jsd": float(jsd[j])} for j, col in enumerate(numeric_cols)
+    }
 
     # Aggregate drift
     psi_values = [v["psi"] for v in drift_metrics.values() if np.isfinite(v["psi"])]
@@ -188,18 +368,19 @@ def main() -> None:
         mlflow.log_metric("jsd_mean", report["drift"]["jsd_mean"])  # type: ignore[index]
         mlflow.log_metric("jsd_p95", report["drift"]["jsd_p95"])  # type: ignore[index]
 
+        # Serialize once for both the artifact and stdout.
+        report_json = json.dumps(report, indent=2)
         out_path = Path(args.out_json)
         out_path.parent.mkdir(parents=True, exist_ok=True)
-        out_path.write_text(json.dumps(report, indent=2))
+        out_path.write_text(report_json)
         mlflow.log_artifact(str(out_path))
 
-    print(json.dumps(report, indent=2))
+    print(report_json)
 
-    # Auto-generate HTML report alongside the JSON
+    # Auto-generate HTML report alongside the JSON, from the in-memory dict
     try:
-        from generate_html_report import generate_html
-        html_path = out_path.with_suffix(".html")
-        generate_html(report, html_path)
+        from generate_html_report import run_inline
+        run_inline(report, out_path.with_suffix(".html"))
     except Exception as e:
         print(f"[WARN] Could not generate HTML report: {e}")
 
@@ -12,33 +12,45 @@ data-quality summary.
 from __future__ import annotations
 
 import argparse
+import heapq
 import json
-from datetime import datetime
+import os
+import re
+from bisect import bisect_right
+from collections.abc import Callable, Iterator
+from datetime import datetime, timezone
+from functools import lru_cache, partial
+from operator import itemgetter
 from pathlib import Path
 
+from jinja2 import DictLoader, Environment, FileSystemBytecodeCache, Template, select_autoescape
+from markupsafe import Markup, escape
 
-def _risk_badge(value: float, thresholds: tuple[float, float]) -> str:
-    lo, hi = thresholds
-    if value < lo:
-        color, label = "#27ae60", "Low"
-    elif value < hi:
-        color, label = "#f39c12", "Medium"
-    else:
-        color, label = "#e74c3c", "High"
-    return f'<span style="background:{color};color:#fff;padding:2px 10px;border-radius:12px;font-size:0.85em;">{label}</span>'
-
+try:
+    import orjson
+except ImportError:  # optional faster parser; stdlib json is used without it
+    orjson = None
 
-def _psi_badge(v: float) -> str:
-    return _risk_badge(v, (0.1, 0.25))
 
+# Badge markup per risk level (Low, Medium, High), built once.
+_BADGE_HTML = tuple(
+    Markup(
+        f'<span style="background:{color};color:#fff;padding:2px 10px;border-radius:12px;font-size:0.85em;">{label}</span>'
+    )
+    for color, label in (("#27ae60", "Low"), ("#f39c12", "Medium"), ("#e74c3c", "High"))
+)
+# Upper bounds of the Low and Medium buckets; bisect_right maps a value to its badge index.
+_PSI_THRESHOLDS = (0.1, 0.25)
+_JSD_THRESHOLDS = (0.05, 0.1)
 
-def _jsd_badge(v: float) -> str:
-    return _risk_badge(v, (0.05, 0.1))
+_OVERALL_RISK = (
+    ("#27ae60", "No Significant Drift Detected"),
+    ("#f39c12", "Moderate Drift — Monitor Closely"),
+    ("#e74c3c", "Significant Drift — Action Required"),
+)
 
 
-def _gauge_svg(value: float, max_val: float, label: str, color: str) -> str:
-    pct = min(value / max_val, 1.0) * 100
-    return f"""
+_GAUGE_TMPL = """
     <div style="text-align:center;min-width:140px;">
       <div style="font-size:0.85em;color:#666;">{label}</div>
       <div style="background:#eee;border-radius:6px;height:18px;margin:4px 0;overflow:hidden;">
@@ -48,75 +60,204 @@ def _gauge_svg(value: float, max_val: float, label: str, color: str) -> str:
     </div>"""
 
 
-def generate_html(report: dict, out_path: Path) -> None:
-    drift = report.get("drift", {})
-    quality = report.get("quality", {})
-    per_feature = drift.get("per_feature", {})
+def _gauge_svg(value: float, max_val: float, label: str, color: str) -> Markup:
+    pct = min(value / max_val, 1.0) * 100
+    return Markup(_GAUGE_TMPL.format(label=label, color=color, pct=pct, value=value))
+
+
+# Whitespace between tags and Jinja tags/expressions; the page has no <pre> or <script>.
+_INTERTAG_WS = re.compile(r"(>|%\}|\}\})\s+(<|\{%|\{\{)")
+_STYLE_BLOCK = re.compile(r"(<style>)(.*?)(</style>)", re.S)
 
-    psi_mean = drift.get("psi_mean", 0)
-    psi_p95 = drift.get("psi_p95", 0)
-    jsd_mean = drift.get("jsd_mean", 0)
-    jsd_p95 = drift.get("jsd_p95", 0)
 
-    # Per-feature rows
-    feature_rows = ""
-    for feat, vals in sorted(per_feature.items(), key=lambda x: -x[1].get("psi", 0)):
-        psi = vals.get("psi", 0)
-        jsd = vals.get("jsd", 0)
-        feature_rows += f"""
+def _minify(html: str) -> str:
+    """Drop indentation between tags and collapse the stylesheet onto one line."""
+    html = _STYLE_BLOCK.sub(lambda m: m.group(1) + " ".join(m.group(2).split()) + m.group(3), html)
+    return _INTERTAG_WS.sub(r"\1\2", html)
+
+
+
+
+_ROW_HTML = """\
         <tr>
-          <td>{feat}</td>
-          <td style="text-align:right;">{psi:.6f}</td>
-          <td style="text-align:center;">{_psi_badge(psi)}</td>
-          <td style="text-align:right;">{jsd:.6f}</td>
-          <td style="text-align:center;">{_jsd_badge(jsd)}</td>
-        </tr>"""
-
-    # Overall risk
-    if psi_mean < 0.1 and jsd_mean < 0.05:
-        overall_color, overall_label = "#27ae60", "No Significant Drift Detected"
-    elif psi_mean < 0.25 and jsd_mean < 0.1:
-        overall_color, overall_label = "#f39c12", "Moderate Drift — Monitor Closely"
-    else:
-        overall_color, overall_label = "#e74c3c", "Significant Drift — Action Required"
+          <td>{_esc(f)}</td>
+          <td style="text-align:right;">{psi:.4f}</td>
+          <td style="text-align:center;">{_b[bp]}</td>
+          <td style="text-align:right;">{jsd:.4f}</td>
+          <td style="text-align:center;">{_b[bj]}</td>
+        </tr>
+"""
+_ROW_CHUNK = 500
+
+
+def _compile_row_emitter(row_html: str) -> Callable[[list], str]:
+    """Generate a per-feature row builder with the thresholds and row markup baked in.
+
+    Large tables spend most of their time here, so the loop body is a single f-string
+    with no badge function calls or tuple/attribute lookups per row. The comparisons
+    match bisect_right over the threshold tuples (NaN lands in High).
+    """
+    (p1, p2), (j1, j2) = _PSI_THRESHOLDS, _JSD_THRESHOLDS
+    src = (
+        "def _emit_rows(items, _esc=escape, _b=_BADGE_HTML):\n"
+        "    out = []\n"
+        "    ap = out.append\n"
+        "    for f, psi, jsd in items:\n"
+        f"        bp = 0 if psi < {p1!r} else (1 if psi < {p2!r} else 2)\n"
+        f"        bj = 0 if jsd < {j1!r} else (1 if jsd < {j2!r} else 2)\n"
+        f'        ap(f"""{row_html}""")\n'
+        "    return ''.join(out)\n"
+    )
+    namespace = {"escape": escape, "_BADGE_HTML": _BADGE_HTML}
+    exec(compile(src, "<generated _emit_rows>", "exec"), namespace)
+    return namespace["_emit_rows"]
 
-    timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
 
-    html = f"""<!DOCTYPE html>
+_emit_rows = _compile_row_emitter(_ROW_HTML)
+_emit_rows_compact = _compile_row_emitter(_minify(_ROW_HTML).strip())
+
+
+def _row_chunks(items: list, emit: Callable[[list], str] = _emit_rows) -> Iterator[Markup]:
+    # Hand the template a few hundred pre-rendered rows at a time so it still streams.
+    for start in range(0, len(items), _ROW_CHUNK):
+        yield Markup(emit(items[start : start + _ROW_CHUNK]))
+
+
+# Static page chrome shared by the template and the inline renderer.
+_HTML_HEAD = """<!DOCTYPE html>
 <html lang="en">
 <head>
 <meta charset="utf-8"/>
 <meta name="viewport" content="width=device-width, initial-scale=1"/>
 <title>Observability Report — Data Drift &amp; Quality</title>
 <style>
-  :root {{ --bg: #f8f9fa; --card: #ffffff; --border: #dee2e6; --text: #212529; --muted: #6c757d; }}
-  * {{ margin:0; padding:0; box-sizing:border-box; }}
-  body {{ font-family:'Segoe UI',system-ui,sans-serif; background:var(--bg); color:var(--text); padding:24px; }}
-  h1 {{ font-size:1.6em; margin-bottom:4px; }}
-  .subtitle {{ color:var(--muted); margin-bottom:20px; font-size:0.9em; }}
-  .card {{ background:var(--card); border:1px solid var(--border); border-radius:10px; padding:20px; margin-bottom:20px; }}
-  .card h2 {{ font-size:1.15em; margin-bottom:12px; border-bottom:2px solid var(--border); padding-bottom:6px; }}
-  .grid {{ display:grid; grid-template-columns:repeat(auto-fit,minmax(260px,1fr)); gap:16px; }}
-  .stat {{ text-align:center; padding:16px; }}
-  .stat .val {{ font-size:2em; font-weight:700; }}
-  .stat .lbl {{ font-size:0.85em; color:var(--muted); }}
-  table {{ width:100%; border-collapse:collapse; font-size:0.9em; }}
-  th, td {{ padding:8px 10px; border-bottom:1px solid var(--border); text-align:left; }}
-  th {{ background:#f1f3f5; font-weight:600; position:sticky; top:0; }}
-  tbody tr:hover {{ background:#f8f9fa; }}
-  .banner {{ padding:14px 20px; border-radius:8px; font-weight:600; font-size:1.05em; margin-bottom:20px; text-align:center; }}
-  .gauge-row {{ display:flex; gap:24px; justify-content:center; flex-wrap:wrap; padding:10px 0; }}
-  .threshold-legend {{ display:flex; gap:16px; justify-content:center; flex-wrap:wrap; font-size:0.82em; color:var(--muted); margin-top:10px; }}
-  .threshold-legend span {{ display:inline-flex; align-items:center; gap:4px; }}
-  .dot {{ width:10px; height:10px; border-radius:50%; display:inline-block; }}
-  .scroll-table {{ max-height:420px; overflow-y:auto; }}
-  @media print {{ body {{ padding:10px; }} .card {{ break-inside:avoid; }} }}
+  :root { --bg: #f8f9fa; --card: #ffffff; --border: #dee2e6; --text: #212529; --muted: #6c757d; }
+  * { margin:0; padding:0; box-sizing:border-box; }
+  body { font-family:'Segoe UI',system-ui,sans-serif; background:var(--bg); color:var(--text); padding:24px; }
+  h1 { font-size:1.6em; margin-bottom:4px; }
+  .subtitle { color:var(--muted); margin-bottom:20px; font-size:0.9em; }
+  .card { background:var(--card); border:1px solid var(--border); border-radius:10px; padding:20px; margin-bottom:20px; }
+  .card h2 { font-size:1.15em; margin-bottom:12px; border-bottom:2px solid var(--border); padding-bottom:6px; }
+  .grid { display:grid; grid-template-columns:repeat(auto-fit,minmax(260px,1fr)); gap:16px; }
+  .stat { text-align:center; padding:16px; }
+  .stat .val { font-size:2em; font-weight:700; }
+  .stat .lbl { font-size:0.85em; color:var(--muted); }
+  table { width:100%; border-collapse:collapse; font-size:0.9em; }
+  th, td { padding:8px 10px; border-bottom:1px solid var(--border); text-align:left; }
+  th { background:#f1f3f5; font-weight:600; position:sticky; top:0; }
+  tbody tr:hover { background:#f8f9fa; }
+  .banner { padding:14px 20px; border-radius:8px; font-weight:600; font-size:1.05em; margin-bottom:20px; text-align:center; }
+  .gauge-row { display:flex; gap:24px; justify-content:center; flex-wrap:wrap; padding:10px 0; }
+  .threshold-legend { display:flex; gap:16px; justify-content:center; flex-wrap:wrap; font-size:0.82em; color:var(--muted); margin-top:10px; }
+  .threshold-legend span { display:inline-flex; align-items:center; gap:4px; }
+  .dot { width:10px; height:10px; border-radius:50%; display:inline-block; }
+  .scroll-table { max-height:420px; overflow-y:auto; }
+  @media print { body { padding:10px; } .card { break-inside:avoid; } }
 </style>
 </head>
 <body>
 
-<h1>📊 Observability Report — Data Drift &amp; Quality</h1>
-<div class="subtitle">Generated: {timestamp} &nbsp;|&nbsp; Baseline rows: {report.get('baseline_rows','—')} &nbsp;|&nbsp; Production rows: {report.get('production_rows','—')}</div>
+"""
+
+_HTML_TAIL = """<!-- Interpretation Guide -->
+<div class="card">
+  <h2>Interpretation Guide</h2>
+  <table>
+    <thead><tr><th>Metric</th><th>What It Measures</th><th>Low</th><th>Medium</th><th>High</th></tr></thead>
+    <tbody>
+      <tr><td><strong>PSI</strong></td><td>Population Stability Index — distribution shift between baseline &amp; production</td><td>&lt; 0.1</td><td>0.1 – 0.25</td><td>&gt; 0.25</td></tr>
+      <tr><td><strong>JSD</strong></td><td>Jensen-Shannon Divergence — symmetric distance between two distributions</td><td>&lt; 0.05</td><td>0.05 – 0.1</td><td>&gt; 0.1</td></tr>
+    </tbody>
+  </table>
+</div>
+
+</body>
+</html>"""
+
+_TABLE_CLOSE = """      </tbody>
+    </table>
+  </div>
+</div>
+
+"""
+
+# The page is head + summary + rows + table close + tail. The summary markup exists only
+# in _render_summary(); the template just streams the rows between the constant pieces.
+_HTML_SRC = (
+    _HTML_HEAD
+    + "{{ summary }}{% for chunk in rows(per_feature) %}{{ chunk }}{% endfor %}\n"
+    + _TABLE_CLOSE
+    + _HTML_TAIL
+)
+
+# Below this many features the inline f-string renderer is cheaper than compiling the template.
+_INLINE_MAX_FEATURES = 20
+
+# Every piece the inline renderer writes starts and ends at a tag, so minifying the
+# pieces one by one gives the same bytes as minifying the whole page.
+_HTML_HEAD_COMPACT = _minify(_HTML_HEAD).strip()
+_TABLE_CLOSE_COMPACT = _minify(_TABLE_CLOSE).strip()
+_HTML_TAIL_COMPACT = _minify(_HTML_TAIL).strip()
+
+
+def _bytecode_cache() -> FileSystemBytecodeCache | None:
+    # The cache is optional: a missing directory is created, an unusable one is skipped.
+    cache_dir = os.getenv("JINJA_BYTECODE_CACHE_DIR")
+    if not cache_dir:
+        return None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError as e:
+        print(f"[WARN] Jinja bytecode cache disabled ({cache_dir}): {e}")
+        return None
+    if not os.access(cache_dir, os.W_OK):
+        # Jinja would raise on the first write into a read-only directory.
+        print(f"[WARN] Jinja bytecode cache disabled ({cache_dir}): directory is not writable")
+        return None
+    return FileSystemBytecodeCache(cache_dir)
+
+
+@lru_cache(maxsize=2)
+def _template(compact: bool = True) -> Template:
+    """Compile the report template once per process (per layout), on first use.
+
+    The compact layout is compiled from minified source, so rendering stays a stream.
+    Set JINJA_BYTECODE_CACHE_DIR to also keep the compiled template across runs.
+    """
+    env = Environment(
+        loader=DictLoader(
+            {
+                "observability_report.html": _HTML_SRC,
+                "observability_report.min.html": _minify(_HTML_SRC),
+            }
+        ),
+        autoescape=select_autoescape(["html"]),
+        trim_blocks=True,
+        lstrip_blocks=True,
+        cache_size=400,
+        auto_reload=False,
+        bytecode_cache=_bytecode_cache(),
+    )
+    env.globals.update(rows=partial(_row_chunks, emit=_emit_rows_compact) if compact else _row_chunks)
+    return env.get_template("observability_report.min.html" if compact else "observability_report.html")
+
+
+def _render_summary(
+    timestamp: str,
+    report: dict,
+    drift: dict,
+    quality: dict,
+    psi_mean: float,
+    psi_p95: float,
+    jsd_mean: float,
+    jsd_p95: float,
+    overall_color: str,
+    overall_label: str,
+    feature_note: str,
+) -> str:
+    """Everything between <body> and the first feature row; report values are escaped."""
+    return f"""<h1>📊 Observability Report — Data Drift &amp; Quality</h1>
+<div class="subtitle">Generated: {timestamp} &nbsp;|&nbsp; Baseline rows: {escape(report.get('baseline_rows','—'))} &nbsp;|&nbsp; Production rows: {escape(report.get('production_rows','—'))}</div>
 
 <div class="banner" style="background:{overall_color}22;color:{overall_color};border:1px solid {overall_color}44;">
   {overall_label}
@@ -143,7 +284,7 @@ def generate_html(report: dict, out_path: Path) -> None:
   <h2>Data Quality</h2>
   <div class="grid">
     <div class="stat">
-      <div class="val">{quality.get('common_columns', '—')}</div>
+      <div class="val">{escape(quality.get('common_columns', '—'))}</div>
       <div class="lbl">Common Columns</div>
     </div>
     <div class="stat">
@@ -163,36 +304,121 @@ def generate_html(report: dict, out_path: Path) -> None:
 
 <!-- Per-Feature Drift -->
 <div class="card">
-  <h2>Per-Feature Drift ({drift.get('num_numeric_features', 0)} numeric features)</h2>
+  <h2>Per-Feature Drift ({escape(drift.get('num_numeric_features', 0))} numeric features{feature_note})</h2>
   <div class="scroll-table">
     <table>
       <thead>
         <tr><th>Feature</th><th style="text-align:right;">PSI</th><th style="text-align:center;">Risk</th><th style="text-align:right;">JSD</th><th style="text-align:center;">Risk</th></tr>
       </thead>
-      <tbody>{feature_rows}</tbody>
-    </table>
-  </div>
-</div>
+      <tbody>
+"""
 
-<!-- Interpretation Guide -->
-<div class="card">
-  <h2>Interpretation Guide</h2>
-  <table>
-    <thead><tr><th>Metric</th><th>What It Measures</th><th>Low</th><th>Medium</th><th>High</th></tr></thead>
-    <tbody>
-      <tr><td><strong>PSI</strong></td><td>Population Stability Index — distribution shift between baseline &amp; production</td><td>&lt; 0.1</td><td>0.1 – 0.25</td><td>&gt; 0.25</td></tr>
-      <tr><td><strong>JSD</strong></td><td>Jensen-Shannon Divergence — symmetric distance between two distributions</td><td>&lt; 0.05</td><td>0.05 – 0.1</td><td>&gt; 0.1</td></tr>
-    </tbody>
-  </table>
-</div>
 
-</body>
-</html>"""
+def _iter_inline(summary: str, per_feature: list, compact: bool = True) -> Iterator[str]:
+    """Yield the page piece by piece; ``summary`` is already minified when ``compact``."""
+    if compact:
+        yield _HTML_HEAD_COMPACT
+        yield summary
+        yield _emit_rows_compact(per_feature)
+        yield _TABLE_CLOSE_COMPACT
+        yield _HTML_TAIL_COMPACT
+    else:
+        yield _HTML_HEAD
+        yield summary
+        yield _emit_rows(per_feature)
+        yield _TABLE_CLOSE
+        yield _HTML_TAIL
+
 
-    out_path.write_text(html, encoding="utf-8")
+def generate_html(report: dict, out_path: Path, top_k: int = 0, pretty: bool = False) -> None:
+    """Write the HTML report; ``top_k`` > 0 lists only the features with the highest PSI.
+
+    Output is minified unless ``pretty`` is set.
+    """
+    drift = report.get("drift", {})
+    quality = report.get("quality", {})
+    per_feature = drift.get("per_feature", {})
+
+    psi_mean = drift.get("psi_mean", 0)
+    psi_p95 = drift.get("psi_p95", 0)
+    jsd_mean = drift.get("jsd_mean", 0)
+    jsd_p95 = drift.get("jsd_p95", 0)
+
+    # Overall risk is the worse of the two mean buckets (NaN lands in High, as before).
+    overall_color, overall_label = _OVERALL_RISK[
+        max(bisect_right(_PSI_THRESHOLDS, psi_mean), bisect_right(_JSD_THRESHOLDS, jsd_mean))
+    ]
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+
+    # (feature, psi, jsd) rows, highest PSI first; dict lookups happen once per feature.
+    items = [(feat, vals.get("psi", 0), vals.get("jsd", 0)) for feat, vals in per_feature.items()]
+    if 0 < top_k < len(items):
+        items = heapq.nlargest(top_k, items, key=itemgetter(1))
+        feature_note = f", top {top_k} by PSI shown"
+    else:
+        items.sort(key=itemgetter(1), reverse=True)
+        feature_note = ""
+
+    summary = _render_summary(
+        timestamp=timestamp,
+        report=report,
+        drift=drift,
+        quality=quality,
+        psi_mean=psi_mean,
+        psi_p95=psi_p95,
+        jsd_mean=jsd_mean,
+        jsd_p95=jsd_p95,
+        overall_color=overall_color,
+        overall_label=overall_label,
+        feature_note=feature_note,
+    )
+    if not pretty:
+        summary = _minify(summary).strip()
+    if len(items) < _INLINE_MAX_FEATURES:
+        # Write straight to the file; newline="" keeps "\n" line endings on every platform.
+        with open(out_path, "w", encoding="utf-8", newline="") as f:
+            f.writelines(_iter_inline(summary, items, compact=not pretty))
+    else:
+        # Stream chunks to the file instead of materialising the whole document.
+        _template(compact=not pretty).stream(summary=Markup(summary), per_feature=items).dump(
+            str(out_path), encoding="utf-8"
+        )
     print(f"HTML report written to: {out_path}")
 
 
+def _load_report(json_path: Path) -> dict:
+    if orjson is not None:
+        try:
+            return orjson.loads(json_path.read_bytes())
+        except orjson.JSONDecodeError:
+            pass  # e.g. NaN PSI values, which json.dumps writes but orjson rejects
+    # Stdlib fallback (orjson missing, or NaN values it rejects). json.load() still decodes
+    # the whole file to str internally; reading bytes just lets it detect the encoding.
+    with open(json_path, "rb") as f:
+        return json.load(f)
+
+
+def run_inline(report: dict, out_path: Path, top_k: int = 0, pretty: bool = False) -> Path:
+    """Render a report that is already in memory, e.g. straight from drift_report.py."""
+    generate_html(report, out_path, top_k=top_k, pretty=pretty)
+    return out_path
+
+
+def main_from_file(json_path: Path, out_html: str = "", top_k: int = 0, pretty: bool = False) -> Path:
+    if not json_path.exists():
+        raise FileNotFoundError(f"Drift JSON not found: {json_path}")
+
+    report = _load_report(json_path)
+
+    if out_html:
+        out = Path(out_html)
+    else:
+        out = json_path.parent / "Observability_Report.html"
+
+    return run_inline(report, out, top_k=top_k, pretty=pretty)
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Generate HTML observability report from drift JSON.")
     parser.add_argument(
@@ -205,20 +431,20 @@ def main() -> None:
         default="",
         help="Output HTML path. Defaults to <json_dir>/Observability_Report.html.",
     )
+    parser.add_argument(
+        "--top_k",
+        type=int,
+        default=0,
+        help="Only list the K features with the highest PSI (0 = all features).",
+    )
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Write indented HTML instead of the default minified output.",
+    )
     args = parser.parse_args()
 
-    json_path = Path(args.json_path)
-    if not json_path.exists():
-        raise FileNotFoundError(f"Drift JSON not found: {json_path}")
-
-    report = json.loads(json_path.read_text(encoding="utf-8"))
-
-    if args.out_html:
-        out = Path(args.out_html)
-    else:
-        out = json_path.parent / "Observability_Report.html"
-
-    generate_html(report, out)
+    main_from_file(Path(args.json_path), args.out_html, top_k=args.top_k, pretty=args.pretty)
 
 
 if __name__ == "__main__":
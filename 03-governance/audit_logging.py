@@ -3,13 +3,21 @@ Governance and Audit Logging for Azure ML
 Demonstrates: Model lineage, audit trails, and compliance reporting
 """
 
-from azure.ai.ml import MLClient
-from azure.ai.ml.entities import Model, Environment
-from azure.identity import DefaultAzureCredential, InteractiveBrowserCredential
-from azure.mgmt.monitor import MonitorManagementClient
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from types import MappingProxyType
 import json
 import os
+import textwrap
+
+try:
+    import orjson
+except ImportError:  # optional faster serializer; stdlib json is used without it
+    orjson = None
+
+# Azure SDK imports are deferred to the functions that call Azure, so importing this
+# module (e.g. for KQL_QUERIES or get_ml_policy_definitions) needs no SDKs or login.
 
 # =============================================================================
 # CONFIGURATION
@@ -19,18 +27,37 @@ SUBSCRIPTION_ID = os.getenv("AZURE_SUBSCRIPTION_ID")
 RESOURCE_GROUP = os.getenv("AZURE_RESOURCE_GROUP", "rg-dnd-mlops-demo")
 WORKSPACE_NAME = os.getenv("AZURE_ML_WORKSPACE", "mlw-dndmlops2-dev")
 
-if not SUBSCRIPTION_ID:
-    raise ValueError(
-        "Missing AZURE_SUBSCRIPTION_ID. Set it as an environment variable before running this script."
-    )
 
-try:
-    credential = DefaultAzureCredential(exclude_interactive_browser_credential=True)
-    credential.get_token("https://management.azure.com/.default")
-except Exception:
-    credential = InteractiveBrowserCredential()
+def _require_subscription_id() -> str:
+    if not SUBSCRIPTION_ID:
+        raise ValueError(
+            "Missing AZURE_SUBSCRIPTION_ID. Set it as an environment variable before running this script."
+        )
+    return SUBSCRIPTION_ID
+
+
+MANAGEMENT_SCOPE = "https://management.azure.com/.default"
+
+
+@lru_cache(maxsize=1)
+def _get_credential():
+    from azure.identity import DefaultAzureCredential
+
+    # Interactive browser login stays available as the last link of the chain, but no
+    # token is requested here; the first SDK call (or _authenticate) does that.
+    return DefaultAzureCredential(exclude_interactive_browser_credential=False)
+
+
+def _authenticate() -> None:
+    """Acquire a management token now, before calls that would otherwise race to log in."""
+    _get_credential().get_token(MANAGEMENT_SCOPE)
 
-ml_client = MLClient(credential, SUBSCRIPTION_ID, RESOURCE_GROUP, WORKSPACE_NAME)
+
+@lru_cache(maxsize=1)
+def _get_ml_client():
+    from azure.ai.ml import MLClient
+
+    return MLClient(_get_credential(), _require_subscription_id(), RESOURCE_GROUP, WORKSPACE_NAME)
 
 
 # =============================================================================
@@ -52,6 +79,11 @@ def register_model_with_governance(
     WHEN it was created, and WHY it was approved.
     """
     
+    from azure.ai.ml.entities import Model
+
+    # One timestamp for the whole registration, so created/approved dates agree.
+    now_iso = datetime.now(timezone.utc).isoformat()
+
     model = Model(
         path=model_path,
         name=model_name,
@@ -68,8 +100,8 @@ def register_model_with_governance(
             "training_job_id": training_job_id,
             
             # WHEN
-            "created_date": datetime.utcnow().isoformat(),
-            "approval_date": datetime.utcnow().isoformat() if approver else "",
+            "created_date": now_iso,
+            "approval_date": now_iso if approver else "",
             
             # WHY
             "approval_reason": "Performance metrics exceed production baseline",
@@ -94,7 +126,7 @@ def register_model_with_governance(
         },
     )
     
-    registered_model = ml_client.models.create_or_update(model)
+    registered_model = _get_ml_client().models.create_or_update(model)
     print(f"Model registered: {registered_model.name}:{registered_model.version}")
     
     return registered_model
@@ -104,119 +136,178 @@ def register_model_with_governance(
 # AUDIT LOG QUERIES
 # =============================================================================
 
-def get_deployment_audit_log(
+ML_RESOURCE_PROVIDER = "Microsoft.MachineLearningServices"
+
+AUDIT_OPERATIONS = {
+    "deployments": "Microsoft.MachineLearningServices/workspaces/onlineEndpoints/deployments/write",
+    "models": "Microsoft.MachineLearningServices/workspaces/models/write",
+}
+
+
+def _list_ml_activity_logs(monitor_client, filter_str: str):
+    """
+    Iterate Activity Log events, asking ARM to pre-filter to the ML resource provider.
+
+    Some tenants reject extra filter clauses; in that case fall back to the plain
+    time/resource-group filter (callers still check the provider client-side).
+    """
+    from azure.core.exceptions import HttpResponseError
+
+    pages = monitor_client.activity_logs.list(
+        filter=f"{filter_str}and resourceProvider eq '{ML_RESOURCE_PROVIDER}'"
+    ).by_page()
+    try:
+        first_page = next(pages, [])
+    except HttpResponseError:
+        yield from monitor_client.activity_logs.list(filter=filter_str)
+        return
+    yield from first_page
+    for page in pages:
+        yield from page
+
+
+def get_ml_audit_logs(
     days_back: int = 30,
-    operation_type: str = "deployments",
+    operation_types=("models", "deployments"),
     max_entries: int = 200,
 ):
     """
-    Query Azure Activity Log for deployment operations.
-    
-    Returns: List of deployment events with who/what/when
+    Query Azure Activity Log once for several ML operation types.
+
+    Returns: {operation_type: list of events with who/what/when}
     """
     
-    monitor_client = MonitorManagementClient(credential, SUBSCRIPTION_ID)
+    from azure.mgmt.monitor import MonitorManagementClient
+
+    monitor_client = MonitorManagementClient(_get_credential(), _require_subscription_id())
     
     # Calculate time range
-    end_time = datetime.utcnow()
+    end_time = datetime.now(timezone.utc)
     start_time = end_time - timedelta(days=days_back)
     
     # Filter for ML workspace operations
     filter_str = (
-        f"eventTimestamp ge '{start_time.isoformat()}' "
-        f"and eventTimestamp le '{end_time.isoformat()}' "
+        f"eventTimestamp ge '{start_time:%Y-%m-%dT%H:%M:%SZ}' "
+        f"and eventTimestamp le '{end_time:%Y-%m-%dT%H:%M:%SZ}' "
         f"and resourceGroupName eq '{RESOURCE_GROUP}' "
     )
     
-    operation_name_value = None
-    if operation_type == "deployments":
-        operation_name_value = "Microsoft.MachineLearningServices/workspaces/onlineEndpoints/deployments/write"
-    elif operation_type == "models":
-        operation_name_value = "Microsoft.MachineLearningServices/workspaces/models/write"
+    targets = {op_type: AUDIT_OPERATIONS.get(op_type) for op_type in operation_types}
+    audit_entries = {op_type: [] for op_type in operation_types}
 
     # Query activity log. Some tenants reject filtering by operationName/operationName.value,
-    # so we always filter by operation client-side.
-    activity_logs = monitor_client.activity_logs.list(filter=filter_str)
-    
-    audit_entries = []
-    for log in activity_logs:
+    # so we always filter by operation client-side. Stop pulling pages once every bucket is full.
+    for log in _list_ml_activity_logs(monitor_client, filter_str):
         rp_val = None
         if getattr(log, "resource_provider_name", None) is not None:
             rp_val = getattr(log.resource_provider_name, "value", None)
-        if rp_val and rp_val != "Microsoft.MachineLearningServices":
+        if rp_val and rp_val != ML_RESOURCE_PROVIDER:
             continue
-        if operation_name_value:
-            op_val = None
-            if getattr(log, "operation_name", None) is not None:
-                op_val = getattr(log.operation_name, "value", None)
-            if op_val and op_val != operation_name_value:
+        op_val = None
+        if getattr(log, "operation_name", None) is not None:
+            op_val = getattr(log.operation_name, "value", None)
+
+        entry = None
+        for op_type, operation_name_value in targets.items():
+            if operation_name_value and op_val and op_val != operation_name_value:
                 continue
-        entry = {
-            "timestamp": log.event_timestamp.isoformat(),
-            "operation": log.operation_name.localized_value,
-            "status": log.status.value,
-            "caller": log.caller,
-            "resource": log.resource_id,
-            "correlation_id": log.correlation_id,
-        }
-        audit_entries.append(entry)
-        if max_entries and len(audit_entries) >= max_entries:
+            if max_entries and len(audit_entries[op_type]) >= max_entries:
+                continue
+            if entry is None:
+                entry = {
+                    "timestamp": log.event_timestamp.isoformat(),
+                    "operation": log.operation_name.localized_value,
+                    "status": log.status.value,
+                    "caller": log.caller,
+                    "resource": log.resource_id,
+                    "correlation_id": log.correlation_id,
+                }
+            audit_entries[op_type].append(entry)
+        if max_entries and all(len(v) >= max_entries for v in audit_entries.values()):
             break
         
     return audit_entries
 
 
-def generate_audit_report(days_back: int = 30):
-    """
-    Generate a comprehensive audit report for compliance.
+def get_deployment_audit_log(
+    days_back: int = 30,
+    operation_type: str = "deployments",
+    max_entries: int = 200,
+):
     """
+    Query Azure Activity Log for deployment operations.
     
-    report = {
-        "generated_at": datetime.utcnow().isoformat(),
-        "period_days": days_back,
-        "workspace": WORKSPACE_NAME,
-        "resource_group": RESOURCE_GROUP,
-        "sections": {}
-    }
-    
-    # 1. Model Registrations
-    print("Fetching model registration events...")
-    report["sections"]["model_registrations"] = get_deployment_audit_log(
-        days_back=days_back,
-        operation_type="models"
-    )
-    
-    # 2. Deployments
-    print("Fetching deployment events...")
-    report["sections"]["deployments"] = get_deployment_audit_log(
-        days_back=days_back,
-        operation_type="deployments"
-    )
-    
-    # 3. Current Models in Registry
-    print("Fetching current models...")
-    models = ml_client.models.list()
-    report["sections"]["registered_models"] = [
+    Returns: List of deployment events with who/what/when
+    """
+    return get_ml_audit_logs(days_back, (operation_type,), max_entries)[operation_type]
+
+
+def _list_registered_models():
+    # Materialize the pager here so the network calls happen in the worker thread.
+    return [
         {
             "name": m.name,
             "version": m.version,
             "created_time": m.creation_context.created_at.isoformat() if m.creation_context else None,
             "tags": m.tags,
         }
-        for m in models
+        for m in _get_ml_client().models.list()
     ]
-    
-    # 4. Active Endpoints
-    print("Fetching active endpoints...")
-    endpoints = ml_client.online_endpoints.list()
-    report["sections"]["active_endpoints"] = [
+
+
+def _list_active_endpoints():
+    return [
         {
             "name": e.name,
             "provisioning_state": e.provisioning_state,
             "created_time": e.creation_context.created_at.isoformat() if e.creation_context else None,
         }
-        for e in endpoints
+        for e in _get_ml_client().online_endpoints.list()
     ]
+
+
+def generate_audit_report(days_back: int = 30):
+    """
+    Generate a comprehensive audit report for compliance.
+    """
+    
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "period_days": days_back,
+        "workspace": WORKSPACE_NAME,
+        "resource_group": RESOURCE_GROUP,
+        "sections": {}
+    }
+    
+    # Build the single MLClient (which validates AZURE_SUBSCRIPTION_ID) and sign in on the
+    # main thread: lru_cache does not serialize construction, so a cold cache would let the
+    # worker threads race to create clients and log in.
+    _get_ml_client()
+    _authenticate()
+    
+    # The fetches are independent network calls, so overlap them.
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        # 1-2. Model Registrations + Deployments (one Activity Log pass)
+        print("Fetching model registration and deployment events...")
+        audit_future = executor.submit(
+            get_ml_audit_logs,
+            days_back=days_back,
+            operation_types=("models", "deployments"),
+        )
+        
+        # 3. Current Models in Registry
+        print("Fetching current models...")
+        models_future = executor.submit(_list_registered_models)
+        
+        # 4. Active Endpoints
+        print("Fetching active endpoints...")
+        endpoints_future = executor.submit(_list_active_endpoints)
+        
+        audit_events = audit_future.result()
+        report["sections"]["model_registrations"] = audit_events["models"]
+        report["sections"]["deployments"] = audit_events["deployments"]
+        report["sections"]["registered_models"] = models_future.result()
+        report["sections"]["active_endpoints"] = endpoints_future.result()
     
     return report
 
@@ -225,7 +316,7 @@ def generate_audit_report(days_back: int = 30):
 # LOG ANALYTICS KQL QUERIES
 # =============================================================================
 
-KQL_QUERIES = {
+_RAW_KQL = {
     "model_deployments": """
     AzureActivity
     | where ResourceProvider == "MICROSOFT.MACHINELEARNINGSERVICES"
@@ -262,6 +353,9 @@ KQL_QUERIES = {
     """,
 }
 
+# Dedented once at import, and read-only so long-lived sessions cannot mutate it.
+KQL_QUERIES = MappingProxyType({name: textwrap.dedent(query).strip() for name, query in _RAW_KQL.items()})
+
 
 # =============================================================================
 # AZURE POLICY DEFINITIONS FOR ML GOVERNANCE
@@ -302,6 +396,17 @@ def get_ml_policy_definitions():
     return policies
 
 
+def write_report_json(report: dict, report_path) -> None:
+    """Write the audit report as indented JSON, via orjson when it is installed."""
+    if orjson is not None:
+        # orjson encodes straight to UTF-8 bytes and handles datetimes natively.
+        with open(report_path, "wb") as f:
+            f.write(orjson.dumps(report, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        return
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+
+
 if __name__ == "__main__":
     # Generate audit report
     print("=" * 60)
@@ -312,8 +417,7 @@ if __name__ == "__main__":
     
     # Save report
     report_path = "audit_report.json"
-    with open(report_path, "w") as f:
-        json.dump(report, f, indent=2, default=str)
+    write_report_json(report, report_path)
     
     print(f"\nAudit report saved to: {report_path}")
     print(f"Model registrations: {len(report['sections'].get('model_registrations', []))}")
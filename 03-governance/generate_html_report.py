@@ -12,119 +12,229 @@ endpoint status, and audit trail.
 from __future__ import annotations
 
 import argparse
+import gzip
+import html
 import json
-from datetime import datetime
+from collections.abc import Callable, Iterator
+from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
+from typing import IO
 
+try:
+    import orjson
+except ImportError:  # optional faster parser; stdlib json is used without it
+    orjson = None
 
+
+_STATUS_COLORS = {
+    **dict.fromkeys(("succeeded", "success", "active", "provisioning succeeded"), "#27ae60"),
+    **dict.fromkeys(("failed", "error"), "#e74c3c"),
+    **dict.fromkeys(("started", "accepted", "creating"), "#3498db"),
+}
+
+
+# Report values come from Azure (names, callers, tags) and are escaped before they
+# reach the page. Callers, operations and versions repeat a lot, so those go through
+# this cache; per-row unique values (timestamps, names) use html.escape directly.
+@lru_cache(maxsize=512)
+def _esc(value: object) -> str:
+    return html.escape(str(value))
+
+
+# Only a handful of distinct statuses occur, so each badge is formatted once per run.
+# Keyed on the raw status so the label keeps its original casing.
+@lru_cache(maxsize=64)
 def _status_badge(status: str) -> str:
-    s = (status or "").lower()
-    if s in ("succeeded", "success", "active", "provisioning succeeded"):
-        color = "#27ae60"
-    elif s in ("failed", "error"):
-        color = "#e74c3c"
-    elif s in ("started", "accepted", "creating"):
-        color = "#3498db"
-    else:
-        color = "#6c757d"
-    return f'<span style="background:{color};color:#fff;padding:2px 10px;border-radius:12px;font-size:0.82em;">{status}</span>'
+    color = _STATUS_COLORS.get((status or "").lower(), "#6c757d")
+    return f'<span style="background:{color};color:#fff;padding:2px 10px;border-radius:12px;font-size:0.82em;">{_esc(status)}</span>'
 
 
-def generate_html(report: dict, out_path: Path) -> None:
-    sections = report.get("sections", {})
-    registered_models = sections.get("registered_models", [])
-    deployments = sections.get("deployments", [])
-    model_registrations = sections.get("model_registrations", [])
-    active_endpoints = sections.get("active_endpoints", [])
+def _tag_str(tags: dict | None) -> str:
+    if not tags:
+        return "—"
+    return ", ".join(f"{k}={v}" for k, v in sorted(tags.items())[:5])
+
 
-    timestamp = report.get("generated_at", datetime.utcnow().isoformat())
-    period = report.get("period_days", "—")
-    workspace = report.get("workspace", "—")
-    rg = report.get("resource_group", "—")
-
-    # Model inventory rows
-    model_rows = ""
-    for m in registered_models:
-        tags = m.get("tags", {}) or {}
-        tag_str = ", ".join(f"{k}={v}" for k, v in sorted(tags.items())[:5]) if tags else "—"
-        model_rows += f"""
+# Rows are yielded one at a time and written straight to the output file.
+def _model_rows(models: list[dict]) -> Iterator[str]:
+    esc, esc_unique = _esc, html.escape
+    for m in models:
+        yield f"""
         <tr>
-          <td>{m.get('name','—')}</td>
-          <td style="text-align:center;">{m.get('version','—')}</td>
-          <td>{(m.get('created_time','') or '—')[:19]}</td>
-          <td style="font-size:0.8em;">{tag_str}</td>
+          <td>{esc_unique(str(m.get('name','—')))}</td>
+          <td style="text-align:center;">{esc(m.get('version','—'))}</td>
+          <td>{esc_unique((m.get('created_time','') or '—')[:19])}</td>
+          <td style="font-size:0.8em;">{esc_unique(_tag_str(m.get('tags')))}</td>
         </tr>"""
 
-    # Deployment event rows
-    deploy_rows = ""
-    for d in deployments:
-        deploy_rows += f"""
-        <tr>
-          <td>{(d.get('timestamp','') or '—')[:19]}</td>
-          <td>{d.get('operation','—')}</td>
-          <td style="text-align:center;">{_status_badge(d.get('status','—'))}</td>
-          <td>{d.get('caller','—')}</td>
+
+@lru_cache(maxsize=1024)
+def _event_row_tail(operation: str, status: str, caller: str) -> str:
+    # Everything after the timestamp cell. Audit trails repeat the same few
+    # (operation, status, caller) triples, so most rows reuse a rendered tail.
+    return f"""</td>
+          <td>{_esc(operation)}</td>
+          <td style="text-align:center;">{_status_badge(status)}</td>
+          <td>{_esc(caller)}</td>
         </tr>"""
 
-    # Model registration event rows
-    reg_rows = ""
-    for r in model_registrations:
-        reg_rows += f"""
+
+def _event_rows(events: list[dict]) -> Iterator[str]:
+    # Deployment and model-registration events share one row layout.
+    esc_unique, tail = html.escape, _event_row_tail
+    for e in events:
+        get = e.get
+        yield f"""
         <tr>
-          <td>{(r.get('timestamp','') or '—')[:19]}</td>
-          <td>{r.get('operation','—')}</td>
-          <td style="text-align:center;">{_status_badge(r.get('status','—'))}</td>
-          <td>{r.get('caller','—')}</td>
-        </tr>"""
+          <td>{esc_unique((get('timestamp','') or '—')[:19])}{tail(get('operation','—'), get('status','—'), get('caller','—'))}"""
+
 
-    # Endpoint rows
-    endpoint_rows = ""
-    for e in active_endpoints:
-        endpoint_rows += f"""
+def _endpoint_rows(endpoints: list[dict]) -> Iterator[str]:
+    esc_unique = html.escape
+    for e in endpoints:
+        yield f"""
         <tr>
-          <td>{e.get('name','—')}</td>
+          <td>{esc_unique(str(e.get('name','—')))}</td>
           <td style="text-align:center;">{_status_badge(e.get('provisioning_state','—'))}</td>
-          <td>{(e.get('created_time','') or '—')[:19]}</td>
+          <td>{esc_unique((e.get('created_time','') or '—')[:19])}</td>
         </tr>"""
 
-    # Summary counts
-    n_models = len(registered_models)
-    n_endpoints = len(active_endpoints)
-    n_deploy_events = len(deployments)
-    n_reg_events = len(model_registrations)
 
-    html = f"""<!DOCTYPE html>
+def _open_output(out_path: Path) -> IO[str]:
+    # A .gz path is compressed on the fly; the repetitive markup shrinks several-fold.
+    if out_path.suffix == ".gz":
+        return gzip.open(out_path, "wt", encoding="utf-8")
+    return open(out_path, "w", encoding="utf-8", buffering=1 << 20)
+
+
+_EVENT_HEADER = "<th>Timestamp</th><th>Operation</th><th style='text-align:center;'>Status</th><th>Caller</th>"
+
+# One entry per table card, in page order:
+# (section key, HTML comment, heading with {n} = row count, header cells, row renderer, empty-state text)
+_SECTIONS: tuple[tuple[str, str, str, str, Callable[[list[dict]], Iterator[str]], str], ...] = (
+    (
+        "registered_models",
+        "Registered Models",
+        "Model Registry Inventory ({n} models)",
+        "<th>Model Name</th><th style='text-align:center;'>Version</th><th>Created</th><th>Tags</th>",
+        _model_rows,
+        "No models found in the registry.",
+    ),
+    (
+        "active_endpoints",
+        "Active Endpoints",
+        "Active Endpoints ({n})",
+        "<th>Endpoint Name</th><th style='text-align:center;'>Status</th><th>Created</th>",
+        _endpoint_rows,
+        "No active endpoints found.",
+    ),
+    (
+        "deployments",
+        "Deployment Audit Trail",
+        "Deployment Audit Trail ({n} events)",
+        _EVENT_HEADER,
+        _event_rows,
+        "No deployment events found in the audit period.",
+    ),
+    (
+        "model_registrations",
+        "Model Registration Audit Trail",
+        "Model Registration Audit Trail ({n} events)",
+        _EVENT_HEADER,
+        _event_rows,
+        "No model registration events captured via Activity Log. Note: SDK-based registrations may not appear in Activity Log — check the Model Registry Inventory above.",
+    ),
+)
+
+
+def _write_sections(fh: IO[str], sections: dict) -> None:
+    write = fh.write
+    for key, comment, title, header, render_rows, empty in _SECTIONS:
+        items = sections.get(key, [])
+        write(f'<!-- {comment} -->\n<div class="card">\n  <h2>{title.format(n=len(items))}</h2>\n  ')
+        if items:
+            write(f"<div class='scroll-table'><table><thead><tr>{header}</tr></thead><tbody>")
+            fh.writelines(render_rows(items))
+            write("</tbody></table></div>")
+        else:
+            write(f"<div class='empty'>{empty}</div>")
+        write("\n</div>\n\n")
+
+
+# Static page chrome, built once at import; generate_html() only formats the middle.
+_HTML_HEAD = """<!DOCTYPE html>
 <html lang="en">
 <head>
 <meta charset="utf-8"/>
 <meta name="viewport" content="width=device-width, initial-scale=1"/>
 <title>Governance &amp; Audit Report</title>
 <style>
-  :root {{ --bg: #f8f9fa; --card: #ffffff; --border: #dee2e6; --text: #212529; --muted: #6c757d; --accent: #0d6efd; }}
-  * {{ margin:0; padding:0; box-sizing:border-box; }}
-  body {{ font-family:'Segoe UI',system-ui,sans-serif; background:var(--bg); color:var(--text); padding:24px; }}
-  h1 {{ font-size:1.6em; margin-bottom:4px; }}
-  .subtitle {{ color:var(--muted); margin-bottom:20px; font-size:0.9em; }}
-  .card {{ background:var(--card); border:1px solid var(--border); border-radius:10px; padding:20px; margin-bottom:20px; }}
-  .card h2 {{ font-size:1.15em; margin-bottom:12px; border-bottom:2px solid var(--border); padding-bottom:6px; }}
-  .grid {{ display:grid; grid-template-columns:repeat(auto-fit,minmax(180px,1fr)); gap:16px; }}
-  .stat {{ text-align:center; padding:16px; background:#f1f3f5; border-radius:8px; }}
-  .stat .val {{ font-size:2em; font-weight:700; color:var(--accent); }}
-  .stat .lbl {{ font-size:0.85em; color:var(--muted); }}
-  table {{ width:100%; border-collapse:collapse; font-size:0.88em; }}
-  th, td {{ padding:8px 10px; border-bottom:1px solid var(--border); text-align:left; }}
-  th {{ background:#f1f3f5; font-weight:600; position:sticky; top:0; }}
-  tbody tr:hover {{ background:#f8f9fa; }}
-  .scroll-table {{ max-height:400px; overflow-y:auto; }}
-  .empty {{ text-align:center; padding:24px; color:var(--muted); font-style:italic; }}
-  .meta-table {{ font-size:0.85em; }}
-  .meta-table td:first-child {{ font-weight:600; width:160px; color:var(--muted); }}
-  @media print {{ body {{ padding:10px; }} .card {{ break-inside:avoid; }} }}
+  :root { --bg: #f8f9fa; --card: #ffffff; --border: #dee2e6; --text: #212529; --muted: #6c757d; --accent: #0d6efd; }
+  * { margin:0; padding:0; box-sizing:border-box; }
+  body { font-family:'Segoe UI',system-ui,sans-serif; background:var(--bg); color:var(--text); padding:24px; }
+  h1 { font-size:1.6em; margin-bottom:4px; }
+  .subtitle { color:var(--muted); margin-bottom:20px; font-size:0.9em; }
+  .card { background:var(--card); border:1px solid var(--border); border-radius:10px; padding:20px; margin-bottom:20px; }
+  .card h2 { font-size:1.15em; margin-bottom:12px; border-bottom:2px solid var(--border); padding-bottom:6px; }
+  .grid { display:grid; grid-template-columns:repeat(auto-fit,minmax(180px,1fr)); gap:16px; }
+  .stat { text-align:center; padding:16px; background:#f1f3f5; border-radius:8px; }
+  .stat .val { font-size:2em; font-weight:700; color:var(--accent); }
+  .stat .lbl { font-size:0.85em; color:var(--muted); }
+  table { width:100%; border-collapse:collapse; font-size:0.88em; }
+  th, td { padding:8px 10px; border-bottom:1px solid var(--border); text-align:left; }
+  th { background:#f1f3f5; font-weight:600; position:sticky; top:0; }
+  tbody tr:hover { background:#f8f9fa; }
+  .scroll-table { max-height:400px; overflow-y:auto; }
+  .empty { text-align:center; padding:24px; color:var(--muted); font-style:italic; }
+  .meta-table { font-size:0.85em; }
+  .meta-table td:first-child { font-weight:600; width:160px; color:var(--muted); }
+  @media print { body { padding:10px; } .card { break-inside:avoid; } }
 </style>
 </head>
 <body>
 
-<h1>🛡️ Governance &amp; Audit Report</h1>
+"""
+
+_HTML_TAIL = """<!-- Compliance Notes -->
+<div class="card">
+  <h2>Compliance Notes</h2>
+  <ul style="padding-left:20px;font-size:0.9em;line-height:1.8;">
+    <li><strong>Activity Log Source:</strong> Azure Monitor Activity Logs (Azure Resource Manager operations)</li>
+    <li><strong>SDK-based model registrations</strong> may not generate Activity Log entries — verify via the Model Registry Inventory section above</li>
+    <li><strong>Retention:</strong> Activity Logs default to 90 days; configure Log Analytics for longer retention</li>
+    <li><strong>RBAC:</strong> Ensure Key Vault uses RBAC authorization (<code>enableRbacAuthorization: true</code>) for auditability</li>
+    <li><strong>Diagnostic Settings:</strong> Must be enabled on the ML workspace for audit log capture (see <code>infra/main.bicep</code>)</li>
+  </ul>
+</div>
+
+</body>
+</html>"""
+
+
+def generate_html(report: dict, out_path: Path) -> None:
+    """Write the report to ``out_path`` as it is rendered; a ``.gz`` suffix gzips it."""
+    sections = report.get("sections", {})
+    registered_models = sections.get("registered_models", [])
+    deployments = sections.get("deployments", [])
+    model_registrations = sections.get("model_registrations", [])
+    active_endpoints = sections.get("active_endpoints", [])
+
+    # Only fall back to "now" when the report carries no timestamp of its own.
+    timestamp = _esc(report.get("generated_at") or datetime.now(timezone.utc).isoformat(timespec="seconds"))
+    period = _esc(report.get("period_days", "—"))
+    workspace = _esc(report.get("workspace", "—"))
+    rg = _esc(report.get("resource_group", "—"))
+
+    # Summary counts
+    n_models = len(registered_models)
+    n_endpoints = len(active_endpoints)
+    n_deploy_events = len(deployments)
+    n_reg_events = len(model_registrations)
+
+    with _open_output(out_path) as fh:
+        fh.write(_HTML_HEAD)
+        fh.write(f"""<h1>🛡️ Governance &amp; Audit Report</h1>
 <div class="subtitle">Generated: {timestamp} &nbsp;|&nbsp; Audit Period: {period} days</div>
 
 <!-- Report Metadata -->
@@ -149,46 +259,9 @@ def generate_html(report: dict, out_path: Path) -> None:
   </div>
 </div>
 
-<!-- Registered Models -->
-<div class="card">
-  <h2>Model Registry Inventory ({n_models} models)</h2>
-  {"<div class='scroll-table'><table><thead><tr><th>Model Name</th><th style='text-align:center;'>Version</th><th>Created</th><th>Tags</th></tr></thead><tbody>" + model_rows + "</tbody></table></div>" if model_rows else "<div class='empty'>No models found in the registry.</div>"}
-</div>
-
-<!-- Active Endpoints -->
-<div class="card">
-  <h2>Active Endpoints ({n_endpoints})</h2>
-  {"<div class='scroll-table'><table><thead><tr><th>Endpoint Name</th><th style='text-align:center;'>Status</th><th>Created</th></tr></thead><tbody>" + endpoint_rows + "</tbody></table></div>" if endpoint_rows else "<div class='empty'>No active endpoints found.</div>"}
-</div>
-
-<!-- Deployment Audit Trail -->
-<div class="card">
-  <h2>Deployment Audit Trail ({n_deploy_events} events)</h2>
-  {"<div class='scroll-table'><table><thead><tr><th>Timestamp</th><th>Operation</th><th style='text-align:center;'>Status</th><th>Caller</th></tr></thead><tbody>" + deploy_rows + "</tbody></table></div>" if deploy_rows else "<div class='empty'>No deployment events found in the audit period.</div>"}
-</div>
-
-<!-- Model Registration Audit Trail -->
-<div class="card">
-  <h2>Model Registration Audit Trail ({n_reg_events} events)</h2>
-  {"<div class='scroll-table'><table><thead><tr><th>Timestamp</th><th>Operation</th><th style='text-align:center;'>Status</th><th>Caller</th></tr></thead><tbody>" + reg_rows + "</tbody></table></div>" if reg_rows else "<div class='empty'>No model registration events captured via Activity Log. Note: SDK-based registrations may not appear in Activity Log — check the Model Registry Inventory above.</div>"}
-</div>
-
-<!-- Compliance Notes -->
-<div class="card">
-  <h2>Compliance Notes</h2>
-  <ul style="padding-left:20px;font-size:0.9em;line-height:1.8;">
-    <li><strong>Activity Log Source:</strong> Azure Monitor Activity Logs (Azure Resource Manager operations)</li>
-    <li><strong>SDK-based model registrations</strong> may not generate Activity Log entries — verify via the Model Registry Inventory section above</li>
-    <li><strong>Retention:</strong> Activity Logs default to 90 days; configure Log Analytics for longer retention</li>
-    <li><strong>RBAC:</strong> Ensure Key Vault uses RBAC authorization (<code>enableRbacAuthorization: true</code>) for auditability</li>
-    <li><strong>Diagnostic Settings:</strong> Must be enabled on the ML workspace for audit log capture (see <code>infra/main.bicep</code>)</li>
-  </ul>
-</div>
-
-</body>
-</html>"""
-
-    out_path.write_text(html, encoding="utf-8")
+""")
+        _write_sections(fh, sections)
+        fh.write(_HTML_TAIL)
     print(f"HTML report written to: {out_path}")
 
 
@@ -202,7 +275,7 @@ def main() -> None:
     parser.add_argument(
         "--out_html",
         default="",
-        help="Output HTML path. Defaults to <json_dir>/Governance_Report.html.",
+        help="Output HTML path (end it in .gz to gzip). Defaults to <json_dir>/Governance_Report.html.",
     )
     args = parser.parse_args()
 
@@ -210,7 +283,9 @@ def main() -> None:
     if not json_path.exists():
         raise FileNotFoundError(f"Audit JSON not found: {json_path}")
 
-    report = json.loads(json_path.read_text(encoding="utf-8"))
+    # Parse the raw bytes; both parsers decode UTF-8 themselves.
+    data = json_path.read_bytes()
+    report = orjson.loads(data) if orjson is not None else json.loads(data)
 
     if args.out_html:
         out = Path(args.out_html)
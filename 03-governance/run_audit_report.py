@@ -11,11 +11,10 @@ Usage (PowerShell):
 
 from __future__ import annotations
 
-import json
 import os
 from pathlib import Path
 
-from audit_logging import generate_audit_report
+from audit_logging import generate_audit_report, write_report_json
 
 
 def main() -> None:
@@ -23,7 +22,7 @@ def main() -> None:
     report = generate_audit_report(days_back=days_back)
 
     out = Path(__file__).resolve().parent / "audit_report.json"
-    out.write_text(json.dumps(report, indent=2, default=str))
+    write_report_json(report, out)
 
     print("Wrote:", out)
     print("Period days:", days_back)
@@ -8,19 +8,11 @@ For the actual runnable workshop script, use:
     python .\04-feature-store\register_feature_assets.py
 """
 
-from azure.ai.ml import MLClient
-from azure.ai.ml.entities import (
-    FeatureStore,
-    FeatureSet,
-    FeatureSetSpec,
-    FeatureEntity,
-    FeatureStoreEntity,
-    MaterializationSettings,
-    MaterializationComputeResource,
-    RecurrenceTrigger,
-)
-from azure.identity import DefaultAzureCredential
 import os
+from functools import lru_cache
+
+# Azure SDK imports live in the functions that call Azure, so the YAML-only
+# __main__ path below runs without the SDKs (or a login).
 
 # =============================================================================
 # CONFIGURATION
@@ -30,7 +22,12 @@ SUBSCRIPTION_ID = os.getenv("AZURE_SUBSCRIPTION_ID")
 RESOURCE_GROUP = os.getenv("AZURE_RESOURCE_GROUP", "rg-dnd-mlops-demo")
 FEATURE_STORE_NAME = os.getenv("FEATURE_STORE_NAME", "fs-dnd-mlops-demo")
 
-credential = DefaultAzureCredential()
+
+@lru_cache(maxsize=1)
+def _get_credential():
+    from azure.identity import DefaultAzureCredential
+
+    return DefaultAzureCredential()
 
 
 # =============================================================================
@@ -45,7 +42,7 @@ def create_feature_store():
     # Use ARM client for feature store creation
     from azure.mgmt.machinelearningservices import MachineLearningServicesMgmtClient
     
-    ml_mgmt_client = MachineLearningServicesMgmtClient(credential, SUBSCRIPTION_ID)
+    ml_mgmt_client = MachineLearningServicesMgmtClient(_get_credential(), SUBSCRIPTION_ID)
     
     feature_store = {
         "location": "eastus",
@@ -278,7 +275,7 @@ def get_training_features(
     
     # Initialize feature store client
     fs_client = FeatureStoreClient(
-        credential=credential,
+        credential=_get_credential(),
         subscription_id=SUBSCRIPTION_ID,
         resource_group=RESOURCE_GROUP,
         name=FEATURE_STORE_NAME,
@@ -326,7 +323,7 @@ def get_inference_features(document_ids: list):
     from azureml.featurestore import FeatureStoreClient
     
     fs_client = FeatureStoreClient(
-        credential=credential,
+        credential=_get_credential(),
         subscription_id=SUBSCRIPTION_ID,
         resource_group=RESOURCE_GROUP,
         name=FEATURE_STORE_NAME,
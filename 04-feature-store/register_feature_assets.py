@@ -23,11 +23,13 @@ from __future__ import annotations
 import os
 from pathlib import Path
 
-from azure.ai.ml import MLClient, load_feature_set, load_feature_store_entity
-from azure.identity import DefaultAzureCredential, InteractiveBrowserCredential
+# Azure SDK imports are deferred to where they are used, so importing this module
+# (or failing the env-var check) does not pay for loading azure.ai.ml.
 
 
 def _get_credential():
+    from azure.identity import DefaultAzureCredential, InteractiveBrowserCredential
+
     try:
         cred = DefaultAzureCredential(exclude_interactive_browser_credential=True)
         cred.get_token("https://management.azure.com/.default")
@@ -53,6 +55,8 @@ def main() -> None:
     if not subscription_id:
         raise ValueError("Missing AZURE_SUBSCRIPTION_ID")
 
+    from azure.ai.ml import MLClient, load_feature_set, load_feature_store_entity
+
     repo_root = Path(__file__).resolve().parents[1]
     assets_dir = Path(__file__).resolve().parent / "assets"
 